@@ -0,0 +1,281 @@
+"""Startup and rerun benchmarks for the Streamlit app.
+
+Drives ``gent.py`` headlessly with Streamlit's AppTest and records:
+
+- cold start: importing Streamlit and the first script run, each in a fresh
+  interpreter so no module or ``st.cache_resource`` state is reused
+- per page: wall time of a warm rerun, and the memory traced by tracemalloc
+  during one rerun (peak and net)
+- journeys: scripted user flows such as finishing all scenarios or making a
+  donation, with their total time and number of script runs
+
+Results are written as JSON. With ``--baseline`` the median timings are
+compared to an earlier result file and the exit code is 1 if any of them
+regressed by more than ``--tolerance``.
+
+Usage:
+    python bench_app.py -o bench.json
+    python bench_app.py --reruns 50 --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Not __name__: under AppTest the app's own module also runs as __main__
+logger = logging.getLogger("bench_app")
+
+APP_PATH = Path(__file__).parent / "gent.py"
+PAGES = ("HOME", "LEARN", "PLAY", "DONATE", "CHECK", "SOURCE", "CLOSE")
+DEFAULT_RERUNS = 20
+DEFAULT_COLD_STARTS = 3
+RUN_TIMEOUT = 60
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Timing summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p90_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+_data_dir: Optional[str] = None
+
+
+def isolate_app_data() -> None:
+    """Point the app's donation ledger and event trail at a temp dir for this process
+
+    Journeys confirm real donations; without this they would be added to the
+    organisers' ledger. Must run before the app's modules are first imported.
+    """
+    global _data_dir
+    if _data_dir is None:
+        _data_dir = tempfile.mkdtemp(prefix="gent-bench-")
+        atexit.register(shutil.rmtree, _data_dir, ignore_errors=True)
+        os.environ["GENT_LEDGER_PATH"] = os.path.join(_data_dir, "donations.db")
+        os.environ["GENT_EVENTS_PATH"] = os.path.join(_data_dir, "events.jsonl")
+
+
+def new_app():
+    isolate_app_data()
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(str(APP_PATH), default_timeout=RUN_TIMEOUT)
+
+
+def check(at) -> None:
+    if at.exception:
+        raise RuntimeError(f"App raised: {at.exception[0].value}")
+
+
+def cold_start_child() -> int:
+    """Time one cold start in this (fresh) process and print it as JSON"""
+    isolate_app_data()
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+    at = AppTest.from_file(str(APP_PATH), default_timeout=RUN_TIMEOUT).run()
+    check(at)
+    finished = time.perf_counter()
+    print(json.dumps({"import_s": imported - started, "first_run_s": finished - imported}))
+    return 0
+
+
+def bench_cold_start(samples: int) -> Dict[str, Dict[str, float]]:
+    imports, first_runs = [], []
+    for _ in range(samples):
+        output = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--cold-start-child"],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        imports.append(result["import_s"])
+        first_runs.append(result["first_run_s"])
+    return {"streamlit_import": summarize(imports), "first_run": summarize(first_runs)}
+
+
+def bench_pages(reruns: int) -> Dict[str, Dict[str, float]]:
+    at = new_app().run()
+    results = {}
+    for page in PAGES:
+        at.session_state.app.page = page
+        at.run()  # Warm this page's caches
+        check(at)
+
+        samples = []
+        for _ in range(reruns):
+            started = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - started)
+        check(at)
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        at.run()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[page] = {
+            **summarize(samples),
+            "alloc_peak_kb": round((peak - before) / 1024, 1),
+            "alloc_net_kb": round((after - before) / 1024, 1),
+        }
+        logger.info(f"{page}: median rerun {results[page]['median_ms']:.1f} ms, "
+                    f"peak alloc {results[page]['alloc_peak_kb']:.0f} KB")
+    return results
+
+
+def button(at, label: str):
+    for candidate in at.button:
+        if candidate.label == label:
+            return candidate
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def journey_scenarios(at) -> None:
+    """Open the Play page and answer every scenario correctly"""
+    from scenarios import ScenarioBank
+    bank = ScenarioBank.load()
+    at.button(key="play_nav").click().run()
+    for scenario_id in at.session_state.app.scenario_ids:
+        at.button(key=f"scenario_{scenario_id}").click().run()
+        at.radio(key=f"answer_{scenario_id}").set_value(bank.get(scenario_id).answer).run()
+        button(at, "Submit Answer").click().run()
+        button(at, "Continue").click().run()
+    if not at.session_state.app.scenario_ids or at.session_state.app.remaining_scenarios():
+        raise RuntimeError("Scenario journey did not finish the round")
+
+
+def journey_donation(at) -> None:
+    """Fill in the donation form, review and confirm"""
+    at.button(key="donate_nav").click().run()
+    for key, value in (("donation_name", "Ana"), ("donation_email", "ana@example.com"),
+                       ("donation_bank", "RBC"), ("donation_phone", "6135550100"),
+                       ("donation_amount", "25")):
+        at.text_input(key=key).input(value)
+    button(at, "Review Donation").click().run()
+    button(at, "Confirm Donation").click().run()
+    if not at.session_state.app.donation_successful:
+        raise RuntimeError("Donation journey did not complete")
+
+
+def journey_learn(at) -> None:
+    """Answer Module 1 and move on to Module 2"""
+    at.button(key="learn_nav").click().run()
+    at.text_area[0].input("A process where wealthy newcomers displace residents who move out").run()
+    button(at, "Submit").click().run()
+    at.button(key="module2_btn").click().run()
+
+
+def journey_check(at) -> None:
+    """Look up a postal code, then filter locations by name"""
+    at.button(key="check_nav").click().run()
+    at.text_input(key="check_point").input("K2P 1L4").run()
+    at.text_input(key="check_search").input("K").run()
+
+
+JOURNEYS: Dict[str, Callable] = {
+    "scenarios": journey_scenarios,
+    "donation": journey_donation,
+    "learn": journey_learn,
+    "check": journey_check,
+}
+
+
+def bench_journeys(repeats: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, journey in JOURNEYS.items():
+        samples = []
+        for _ in range(repeats):
+            at = new_app().run()
+            runs_before = at.session_state.app.script_runs
+            started = time.perf_counter()
+            journey(at)
+            samples.append(time.perf_counter() - started)
+            check(at)
+            script_runs = at.session_state.app.script_runs - runs_before
+        results[name] = {**summarize(samples), "script_runs": script_runs}
+        logger.info(f"Journey {name}: median {results[name]['median_ms']:.0f} ms over {script_runs} runs")
+    return results
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Median timings that are more than ``tolerance`` slower than the baseline"""
+    found = []
+    for section in ("cold_start", "pages", "journeys"):
+        for name, stats in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if not old or not old.get("median_ms"):
+                continue
+            change = stats["median_ms"] / old["median_ms"] - 1
+            if change > tolerance:
+                found.append(f"{section}.{name}: {old['median_ms']:.1f} -> {stats['median_ms']:.1f} ms (+{change:.0%})")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark app startup, page reruns and user journeys")
+    parser.add_argument("-o", "--output", default="-", help="JSON results path, or - for stdout")
+    parser.add_argument("--reruns", type=int, default=DEFAULT_RERUNS, help="Timed reruns per page")
+    parser.add_argument("--cold-starts", type=int, default=DEFAULT_COLD_STARTS, help="Fresh-process cold starts")
+    parser.add_argument("--journey-repeats", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare median timings against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a regression, e.g. 0.2")
+    parser.add_argument("--cold-start-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_start_child:
+        logging.disable(logging.CRITICAL)
+        return cold_start_child()
+
+    # The app logs every navigation at INFO; keep only this module's progress
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    logger.setLevel(logging.INFO)
+
+    import streamlit
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "platform": platform.platform(),
+            "reruns": args.reruns,
+        },
+        "cold_start": bench_cold_start(args.cold_starts),
+        "pages": bench_pages(args.reruns),
+        "journeys": bench_journeys(args.journey_repeats),
+    }
+    logger.info(f"Cold start: first run median {results['cold_start']['first_run']['median_ms']:.0f} ms")
+
+    text = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in found:
+            logger.warning(f"Regression: {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
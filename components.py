@@ -0,0 +1,136 @@
+"""Card components for the app's pages.
+
+A card that only holds text is rendered as one ``st.markdown`` element whose
+HTML is built once per distinct content and memoized. A card that holds
+widgets is a keyed ``st.container``; Streamlit adds ``st-key-<key>`` to the
+container's class list, which the stylesheet matches, so the card styling
+wraps the widgets without separate opening and closing ``<div>`` elements.
+
+Check page risk cards are rendered from a fixed template with colours
+precomputed per risk tier, and cached per location for a dataset version.
+
+Images such as the logo are bundled under ``assets/``, read once per process
+and inlined as data URIs, so no render waits on the network.
+"""
+import base64
+import mimetypes
+import textwrap
+from functools import lru_cache
+from html import escape
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import streamlit as st
+
+from location_store import Location
+from risk_scoring import RISK_TIERS
+
+ASSETS_DIR = Path(__file__).parent / "assets"
+LOGO_PATH = ASSETS_DIR / "logo.svg"
+
+CARD_CLASSES = ("card", "scenario-card", "donate-card", "location-card")
+
+# Check page colours per computed risk tier, ordered from lowest to highest risk
+RISK_COLOR = dict(zip(RISK_TIERS, [
+    "#10B981",  # Green
+    "#34D399",  # Light Green
+    "#FBBF24",  # Yellow
+    "#F59E0B",  # Orange
+    "#DC2626"  # Red
+]))
+UNKNOWN_RISK_COLOR = "#6B7280"
+# Opacity of the tinted background behind the risk label
+RISK_BADGE_ALPHA = 0.15
+
+
+@lru_cache(maxsize=256)
+def card_html(css_class: str, *sections: str) -> str:
+    """HTML for a card whose markdown sections are wrapped in a single styled div"""
+    # Blank lines around the sections keep them parsed as markdown inside the div
+    body = "\n\n".join(textwrap.dedent(section).strip() for section in sections)
+    return f'<div class="{css_class}">\n\n{body}\n\n</div>'
+
+
+def render_card(*sections: str, css_class: str = "card") -> None:
+    st.markdown(card_html(css_class, *sections), unsafe_allow_html=True)
+
+
+def card_container(name: str, css_class: str = "card"):
+    """Container styled as a card, for cards that hold widgets"""
+    if css_class not in CARD_CLASSES:
+        raise ValueError(f"Unknown card class: {css_class}")
+    return st.container(key=f"{css_class}-{name}")
+
+
+def _badge_background(hex_color: str) -> str:
+    red, green, blue = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({red}, {green}, {blue}, {RISK_BADGE_ALPHA})"
+
+
+# (label colour, badge background) per tier, parsed once at import
+TIER_COLORS: Dict[str, Tuple[str, str]] = {
+    tier: (color, _badge_background(color)) for tier, color in RISK_COLOR.items()
+}
+UNKNOWN_TIER_COLORS = (UNKNOWN_RISK_COLOR, _badge_background(UNKNOWN_RISK_COLOR))
+
+RISK_CARD_TEMPLATE = (
+    "<div style='padding: 20px; background-color: #FFFFFF; border-radius: 10px; "
+    "border-left: 5px solid {color}; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);'>"
+    "<h3 style='margin-top: 0; color: #1F2937; font-weight: 700;'>{name}</h3>"
+    "<p style='color: #1F2937; font-size: 16px; line-height: 1.6;'>{description}</p>"
+    "<div style='background-color: #F3F4F6; padding: 10px; border-radius: 5px; margin-top: 15px;'>"
+    "<p style='margin: 0; font-weight: 600; color: #1F2937;'>Gentrification Risk: "
+    "<span style='color: {color}; background-color: {background}; padding: 3px 8px; "
+    "border-radius: 4px; font-weight: 700;'>{tier}</span> "
+    "<span style='font-weight: 400;'>(score {score:.0f}/100)</span>"
+    "</p></div></div>"
+)
+
+
+class RiskCardRenderer:
+    """Risk card HTML for one dataset version, rendered at most once per location"""
+
+    def __init__(self, version: str):
+        self.version = version
+        self._cards: Dict[str, str] = {}
+
+    def html(self, location: Location, tier: str, score: float) -> str:
+        card = self._cards.get(location.name)
+        if card is None:
+            color, background = TIER_COLORS.get(tier, UNKNOWN_TIER_COLORS)
+            card = self._cards[location.name] = RISK_CARD_TEMPLATE.format(
+                color=color,
+                background=background,
+                name=escape(location.name),
+                description=escape(location.description),
+                tier=escape(tier),
+                score=score * 100,
+            )
+        return card
+
+    def render(self, location: Location, tier: str, score: float) -> None:
+        st.markdown(self.html(location, tier, score), unsafe_allow_html=True)
+
+
+@lru_cache(maxsize=None)
+def load_asset(path: Path) -> bytes:
+    """Read a bundled asset once per process"""
+    return path.read_bytes()
+
+
+@lru_cache(maxsize=None)
+def asset_data_uri(path: Path) -> str:
+    mime_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return f"data:{mime_type};base64,{base64.b64encode(load_asset(path)).decode('ascii')}"
+
+
+@lru_cache(maxsize=16)
+def image_html(path: Path, width: int, alt: str, caption: Optional[str] = None) -> str:
+    img = f'<img src="{asset_data_uri(path)}" width="{width}" alt="{escape(alt)}">'
+    if caption is None:
+        return img
+    return f'<figure style="margin: 0;">{img}<figcaption>{escape(caption)}</figcaption></figure>'
+
+
+def render_logo(width: int = 150, caption: Optional[str] = None) -> None:
+    st.markdown(image_html(LOGO_PATH, width, "Gentrification Awareness App logo", caption), unsafe_allow_html=True)
@@ -0,0 +1,343 @@
+"""Durable ledger of confirmed donations.
+
+Donations are stored in a SQLite database in WAL mode with full fsync on
+commit. Writes are write-behind: ``DonationLedger.record`` queues the donation
+and returns a future at once, and a single writer thread commits everything
+queued so far in one transaction, so a burst of confirmations shares one
+fsync instead of each session waiting for its own.
+
+Every donation carries an idempotency key, unique in the table and inserted
+with ``INSERT ... ON CONFLICT (idempotency_key) DO NOTHING``, so the same
+confirmation submitted twice (a double click or a repeated rerun) is stored
+once. Only a duplicate key is skipped: a row breaking a CHECK or NOT NULL
+constraint still fails, and its batch is retried one donation at a time so
+only that donation is rejected.
+
+Campaign totals (overall, per day and per bank) are kept in small summary
+tables updated in the same transaction as each insert, so reading them never
+scans the donations. ``prepare`` creates them, and backfills them for a ledger
+written before they existed, before the writer or ``totals`` first uses a
+ledger file. ``iter_csv`` exports the ledger in chunks of rows.
+
+Usage:
+    python donation_ledger.py -o donations.csv
+    python donation_ledger.py --totals
+"""
+import argparse
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PATH = Path(os.environ.get("GENT_LEDGER_PATH", Path(__file__).parent / "data" / "donations.db"))
+# Most donations committed in one transaction
+MAX_BATCH = 256
+# Largest single donation accepted, in cents
+MAX_AMOUNT_CENTS = 100_000 * 100
+EXPORT_CHUNK_ROWS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS donations (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    bank TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_donations_created_at ON donations (created_at);
+CREATE TABLE IF NOT EXISTS donation_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS donation_daily (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS donation_banks (
+    bank TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL
+);
+"""
+
+# Upserts run for every newly inserted donation, inside the insert's transaction
+TOTALS_UPDATES = (
+    ("INSERT INTO donation_totals (id, count, total_cents) VALUES (1, 1, :amount_cents) "
+     "ON CONFLICT (id) DO UPDATE SET count = count + 1, total_cents = total_cents + excluded.total_cents"),
+    ("INSERT INTO donation_daily (day, count, total_cents) VALUES (:day, 1, :amount_cents) "
+     "ON CONFLICT (day) DO UPDATE SET count = count + 1, total_cents = total_cents + excluded.total_cents"),
+    ("INSERT INTO donation_banks (bank, count, total_cents) VALUES (:bank, 1, :amount_cents) "
+     "ON CONFLICT (bank) DO UPDATE SET count = count + 1, total_cents = total_cents + excluded.total_cents"),
+)
+
+# Rebuilds the summary tables from the donations, for a ledger written before they existed
+REBUILD_TOTALS = """
+DELETE FROM donation_totals;
+DELETE FROM donation_daily;
+DELETE FROM donation_banks;
+INSERT INTO donation_totals (id, count, total_cents)
+    SELECT 1, COUNT(*), SUM(amount_cents) FROM donations HAVING COUNT(*) > 0;
+INSERT INTO donation_daily (day, count, total_cents)
+    SELECT substr(created_at, 1, 10), COUNT(*), SUM(amount_cents) FROM donations GROUP BY 1;
+INSERT INTO donation_banks (bank, count, total_cents)
+    SELECT upper(bank), COUNT(*), SUM(amount_cents) FROM donations GROUP BY 1;
+"""
+
+EXPORT_COLUMNS = ("id", "created_at", "amount_cents", "name", "email", "phone", "bank")
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class DonationRecord:
+    idempotency_key: str
+    amount_cents: int
+    name: str
+    email: str
+    phone: str
+    bank: str
+    created_at: str = ""
+
+    def row(self) -> Dict[str, object]:
+        created_at = self.created_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return {
+            "idempotency_key": self.idempotency_key,
+            "created_at": created_at,
+            "day": created_at[:10],
+            "amount_cents": self.amount_cents,
+            "name": self.name,
+            "email": self.email,
+            "phone": self.phone,
+            "bank": self.bank,
+        }
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+_prepared: Set[Path] = set()
+_prepared_lock = threading.Lock()
+
+
+def prepare(path: Path = LEDGER_PATH) -> None:
+    """Create the ledger's tables and backfill missing totals; done once per path per process"""
+    with _prepared_lock:
+        if path in _prepared:
+            return
+        conn = connect(path)
+        try:
+            conn.executescript(SCHEMA)
+            has_donations = conn.execute("SELECT 1 FROM donations LIMIT 1").fetchone()
+            has_totals = conn.execute("SELECT 1 FROM donation_totals").fetchone()
+            if has_donations and not has_totals:
+                logger.info(f"Rebuilding donation totals in {path}")
+                conn.executescript(f"BEGIN IMMEDIATE; {REBUILD_TOTALS} COMMIT;")
+        finally:
+            conn.close()
+        _prepared.add(path)
+
+
+class DonationLedger:
+    """SQLite donation ledger with a write-behind, group-committing writer thread"""
+
+    def __init__(self, path: Path = LEDGER_PATH):
+        self.path = path
+        prepare(path)
+        self._conn = connect(path)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="donation-ledger", daemon=True)
+        self._thread.start()
+
+    def record(self, donation: DonationRecord) -> "Future[bool]":
+        """Queue a donation; the future resolves to False if its key was already recorded"""
+        future: "Future[bool]" = Future()
+        amount = donation.amount_cents
+        if not isinstance(amount, int) or not 0 < amount <= MAX_AMOUNT_CENTS:
+            # Rejected here so one bad donation never fails a whole batch
+            future.set_exception(ValueError(f"Donation amount out of range: {amount!r} cents"))
+            return future
+        self._queue.put((donation, future))
+        return future
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Commit everything still queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._conn.close()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Tuple[DonationRecord, Future]] = []
+            item = self._queue.get()
+            # Take whatever else is already waiting so it shares this commit
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch: List[Tuple[DonationRecord, Future]]) -> None:
+        # Anything raised here must fail the batch's futures, never the writer thread
+        try:
+            inserted = []
+            self._conn.execute("BEGIN IMMEDIATE")
+            for donation, _ in batch:
+                row = donation.row()
+                cursor = self._conn.execute(
+                    "INSERT INTO donations "
+                    "(idempotency_key, created_at, amount_cents, name, email, phone, bank) "
+                    "VALUES (:idempotency_key, :created_at, :amount_cents, :name, :email, :phone, :bank) "
+                    "ON CONFLICT (idempotency_key) DO NOTHING",
+                    row,
+                )
+                inserted.append(cursor.rowcount == 1)
+                if cursor.rowcount == 1:
+                    # Bank names are typed freely; group "rbc" with "RBC"
+                    row["bank"] = row["bank"].upper()
+                    for update in TOTALS_UPDATES:
+                        self._conn.execute(update, row)
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+            except sqlite3.Error as rollback_error:
+                logger.error(f"Donation ledger rollback failed: {rollback_error}")
+            if len(batch) > 1:
+                # Retry one by one, so only the donation that caused the failure is lost
+                logger.warning(f"Donation ledger commit of {len(batch)} donations failed ({e}); retrying singly")
+                for item in batch:
+                    self._commit([item])
+                return
+            logger.error(f"Donation ledger commit failed: {e}")
+            batch[0][1].set_exception(e)
+            return
+        for (_, future), was_inserted in zip(batch, inserted):
+            future.set_result(was_inserted)
+
+
+def open_reader(path: Path = LEDGER_PATH) -> sqlite3.Connection:
+    """Read-only connection; in WAL mode it reads a consistent snapshot alongside the writer"""
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def totals(path: Path = LEDGER_PATH) -> Dict[str, object]:
+    """Campaign totals overall, per day (UTC) and per bank, from the summary tables"""
+    if not path.exists():
+        return {"count": 0, "total_cents": 0, "by_day": [], "by_bank": []}
+    # A ledger from before the summary tables existed gets them here if no writer has run yet
+    prepare(path)
+    conn = open_reader(path)
+    try:
+        count, total_cents = conn.execute(
+            "SELECT count, total_cents FROM donation_totals WHERE id = 1").fetchone() or (0, 0)
+        by_day = conn.execute(
+            "SELECT day, count, total_cents FROM donation_daily ORDER BY day DESC").fetchall()
+        by_bank = conn.execute(
+            "SELECT bank, count, total_cents FROM donation_banks ORDER BY total_cents DESC").fetchall()
+    finally:
+        conn.close()
+    return {
+        "count": count,
+        "total_cents": total_cents,
+        "by_day": [{"day": d, "count": c, "total_cents": t} for d, c, t in by_day],
+        "by_bank": [{"bank": b, "count": c, "total_cents": t} for b, c, t in by_bank],
+    }
+
+
+def iter_csv(path: Path = LEDGER_PATH, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """The ledger as CSV text, yielded a header and then one chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    if not path.exists():
+        return
+    conn = open_reader(path)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM donations ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+_ledger: Optional[DonationLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> DonationLedger:
+    """The process-wide ledger, opened on first use and drained at exit"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = DonationLedger()
+                atexit.register(_ledger.close)
+    return _ledger
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the donation ledger or print campaign totals")
+    parser.add_argument("--ledger", type=Path, default=LEDGER_PATH)
+    parser.add_argument("-o", "--output", default="-", help="CSV output path, or - for stdout")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument("--totals", action="store_true", help="Print the campaign totals as JSON instead")
+    args = parser.parse_args(argv)
+
+    if args.totals:
+        print(json.dumps(totals(args.ledger), indent=2))
+        return 0
+
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in iter_csv(args.ledger, args.chunk_rows):
+            sink.write(chunk)
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Structured event trail written off the script thread.
+
+``EventLog.emit`` only puts a small dict on a bounded queue; a background
+thread serialises queued events to JSON lines and appends them in batches,
+rotating the file by size. When the queue is full the event is dropped and
+counted rather than blocking the user's rerun.
+
+Each server process writes its own file, ``GENT_EVENTS_PATH`` with its pid
+inserted (``events.<pid>.jsonl``), so processes never append to or rotate a
+file another one is writing.
+
+``start_queue_logging`` routes the standard logging module the same way, so
+``logger.info`` calls on the script thread never wait on a handler's I/O.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = Path(os.environ.get("GENT_EVENTS_PATH", Path(__file__).parent / "data" / "events.jsonl"))
+MAX_QUEUED_EVENTS = 10_000
+BATCH_SIZE = 500
+# Longest an event waits in the queue before its batch is written
+FLUSH_INTERVAL = 1.0
+MAX_FILE_BYTES = 10 << 20
+BACKUP_COUNT = 5
+
+_STOP = object()
+
+
+class EventLog:
+    """Bounded, non-blocking JSONL event writer with size-based rotation"""
+
+    def __init__(self, path: Optional[Path] = None, max_queued: int = MAX_QUEUED_EVENTS,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_bytes: int = MAX_FILE_BYTES, backup_count: int = BACKUP_COUNT):
+        self.path = path or process_events_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._dropped_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def emit(self, event_type: str, **fields: Any) -> bool:
+        """Queue an event; returns False if it was dropped because the queue is full"""
+        event = {"ts": time.time(), "type": event_type, **fields}
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write everything still queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            deadline = time.monotonic() + self.flush_interval
+            # Block for the first event, then gather more until the batch is full or its time is up
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(batch)
+                except (OSError, TypeError, ValueError) as e:
+                    # Never let a bad event or a full disk kill the writer
+                    logger.exception(f"Event log write failed, {len(batch)} events lost: {e}")
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(event, default=str, ensure_ascii=False) + "\n" for event in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            size = f.tell()
+        self.written += len(batch)
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        """events.<pid>.jsonl -> events.<pid>.jsonl.1 -> ... -> .<backup_count>, dropping the oldest"""
+        for i in range(self.backup_count - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+
+def process_events_path(path: Path = EVENTS_PATH) -> Path:
+    """This process's event file: ``path`` with the pid before its suffix"""
+    return path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+
+
+_event_log: Optional[EventLog] = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log() -> EventLog:
+    """The process-wide event log, started on first use and flushed at exit"""
+    global _event_log
+    if _event_log is None:
+        with _event_log_lock:
+            if _event_log is None:
+                _event_log = EventLog()
+                atexit.register(_event_log.close)
+    return _event_log
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def start_queue_logging(level: int = logging.INFO) -> None:
+    """Send root logging through a queue to a stderr handler on a listener thread
+
+    Like ``logging.basicConfig`` this does nothing if the root logger already
+    has handlers, so it is safe to call on every rerun.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    log_queue: "queue.Queue" = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(_DroppingQueueHandler(log_queue))
+    root.setLevel(level)
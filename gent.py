@@ -1,37 +1,58 @@
 import streamlit as st
 import time
 import base64
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
+import os
 from pathlib import Path
 import logging
+import functools
+import hmac
+from html import escape
+import uuid
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from components import RISK_COLOR, UNKNOWN_RISK_COLOR, RiskCardRenderer, card_container, render_card, render_logo
+from donation_ledger import LEDGER_PATH, MAX_AMOUNT_CENTS, DonationRecord, get_ledger, totals as donation_totals
+from events import get_event_log, start_queue_logging
+from instrumentation import (
+    ENABLED as INSTRUMENTED, WRITE_INTERVAL, count_deltas, maybe_write_prometheus, observe, process_metrics_path, prometheus_text,
+    summaries, timed,
+)
+from location_store import LocationStore
+from navigation import NAV_ITEMS
+from payments import (
+    CHARGED as PAYMENT_CHARGED, ENABLED as PAYMENTS_ENABLED, PENDING as PAYMENT_PENDING, SETTLED as PAYMENT_SETTLED,
+    get_payments,
+)
+from risk_table import RiskTable, open_risk_table
+from rubrics import REFERENCE_ANSWERS, grade as grade_answer
+from scenarios import ScenarioBank
+from session_state import LEARN_MODULES, AppState, deep_sizeof
+from similarity import SIMILARITY_PASS_THRESHOLD, SimilarityGrader
+from spatial_index import GridIndex, load_postal_centroids, parse_query
+from theme import STATIC_URL, THEME_CHOICES, build_stylesheet, write_stylesheet
+
+# Configure logging; records are handed to a listener thread so handlers never block a rerun
+start_queue_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-THEME = {
-    'light': {
-        'primary': '#1E3A8A',
-        'secondary': '#3B82F6',
-        'background': '#F0F9FF',
-        'text': '#1F2937',
-        'success': '#047857',
-        'error': '#DC2626',
-        'warning': '#F59E0B'
-    },
-    'dark': {
-        'primary': '#60A5FA',
-        'secondary': '#93C5FD',
-        'background': '#1F2937',
-        'text': '#F9FAFB',
-        'success': '#34D399',
-        'error': '#EF4444',
-        'warning': '#FBBF24'
-    }
-}
+LOCATIONS_PER_PAGE = 5
+NEAREST_LOCATIONS = 3
+SCENARIOS_PER_SESSION = 3
+# Learn free-text grading: "keywords" (rubric matches) or "similarity" (TF-IDF against the reference answer)
+GRADING_MODE = os.environ.get("GENT_GRADING_MODE", "keywords")
+# Show per-session diagnostics (state memory) in the sidebar
+DEBUG_STATS = os.environ.get("GENT_DEBUG_STATS") == "1"
+# Render sidebar navigation as a fragment, so clicks that keep the page skip the main content
+SIDEBAR_FRAGMENT = os.environ.get("GENT_SIDEBAR_FRAGMENT") == "1"
+# Seconds to wait for a confirmed donation's ledger commit
+LEDGER_TIMEOUT = 10.0
+# Seconds between checks of a pending payment
+PAYMENT_POLL_INTERVAL = 1.0
+# Token that unlocks the hidden ADMIN page (campaign totals, timings); unset disables the page
+ADMIN_TOKEN = os.environ.get("GENT_ADMIN_TOKEN", "")
 
 # Set page configuration with improved metadata
 st.set_page_config(
@@ -50,275 +71,239 @@ st.set_page_config(
     }
 )
 
-# Fixed CSS with proper structure and no duplicates
-st.markdown("""
-<style>
-    /* Base styles with dark mode support */
-    :root {
-        --primary-color: #1E3A8A;
-        --secondary-color: #3B82F6;
-        --background-color: #F0F9FF;
-        --text-color: #1F2937;
-        --success-color: #047857;
-        --error-color: #DC2626;
-        --warning-color: #F59E0B;
-    }
-
-    @media (prefers-color-scheme: dark) {
-        :root {
-            --primary-color: #60A5FA;
-            --secondary-color: #93C5FD;
-            --background-color: #1F2937;
-            --text-color: #F9FAFB;
-            --success-color: #34D399;
-            --error-color: #EF4444;
-            --warning-color: #FBBF24;
-        }
-    }
-
-    /* Typography and base styles */
-    * {
-        font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        line-height: 1.5;
-    }
-
-    /* Headers */
-    .main-header {
-        font-size: clamp(2rem, 5vw, 2.625rem);
-        font-weight: 800;
-        color: var(--primary-color);
-        text-align: center;
-        margin-bottom: 1.5rem;
-        padding: 1.5rem;
-        background-color: var(--background-color);
-        border-radius: 1rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-
-    .module-header {
-        font-size: 1.75rem;
-        font-weight: 700;
-        color: var(--primary-color);
-        margin: 1.25rem 0 1rem;
-        padding: 0.75rem;
-        background-color: var(--background-color);
-        border-radius: 0.5rem;
-    }
-
-    .sub-header {
-        font-size: 1.5rem;
-        font-weight: 600;
-        color: var(--primary-color);
-        margin: 1rem 0 0.75rem;
-    }
-
-    /* Cards */
-    .card {
-        padding: 1.5rem;
-        border-radius: 1rem;
-        background-color: var(--background-color);
-        margin-bottom: 1.5rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        transition: transform 0.3s ease, box-shadow 0.3s ease;
-    }
-
-    .card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
-    }
-
-    .scenario-card {
-        padding: 1.5rem;
-        border-radius: 1rem;
-        background-color: var(--background-color);
-        margin-bottom: 1.5rem;
-        border-left: 0.5rem solid var(--secondary-color);
-    }
-
-    .donate-card {
-        padding: 1.5rem;
-        border-radius: 1rem;
-        background-color: var(--background-color);
-        margin-bottom: 1.5rem;
-        border-left: 0.5rem solid var(--success-color);
-    }
-
-    .location-card {
-        padding: 1.25rem;
-        border-radius: 0.75rem;
-        background-color: var(--background-color);
-        margin-bottom: 1.25rem;
-        border-left: 0.5rem solid var(--secondary-color);
-    }
-
-    /* Interactive elements */
-    .button-primary {
-        background-color: var(--primary-color);
-        color: white;
-        border-radius: 0.5rem;
-        padding: 0.75rem 1rem;
-        font-weight: 600;
-        border: none;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-
-    .button-primary:hover {
-        background-color: var(--secondary-color);
-        transform: translateY(-1px);
-    }
+# Initialize session state: a single typed object per session
+if 'app' not in st.session_state:
+    st.session_state.app = AppState()
+    # Hidden admin page, opened with ?page=admin and unlocked with ADMIN_TOKEN
+    if ADMIN_TOKEN and st.query_params.get("page") == "admin":
+        st.session_state.app.page = 'ADMIN'
 
-    .button-success {
-        background-color: var(--success-color);
-        color: white;
-        border-radius: 0.5rem;
-        padding: 0.75rem 1rem;
-        font-weight: 600;
-        border: none;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
+run_started = time.perf_counter()
 
-    .button-warning {
-        background-color: var(--warning-color);
-        color: white;
-        border-radius: 0.5rem;
-        padding: 0.75rem 1rem;
-        font-weight: 600;
-        border: none;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
+# Count script executions so reruns per interaction can be checked
+st.session_state.app.script_runs += 1
+st.session_state.app.runs_since_interaction += 1
+st.session_state.app.deltas_last_run = st.session_state.app.deltas_this_run
+st.session_state.app.deltas_this_run = 0
 
-    /* Progress and status indicators */
-    .progress-container {
-        width: 100%;
-        background-color: var(--background-color);
-        border-radius: 1rem;
-        margin: 1.5rem 0;
-        overflow: hidden;
-        box-shadow: inset 0 2px 4px rgba(0, 0, 0, 0.1);
-    }
-
-    .progress-bar {
-        height: 0.75rem;
-        border-radius: 1rem;
-        background: linear-gradient(90deg, var(--primary-color), var(--secondary-color));
-        transition: width 0.5s ease-in-out;
-    }
-
-    /* Status messages */
-    .correct-answer {
-        color: var(--success-color);
-        font-weight: 600;
-    }
-
-    .wrong-answer {
-        color: var(--error-color);
-        font-weight: 600;
-    }
-
-    .highlight-text {
-        background-color: var(--warning-color);
-        padding: 0.25rem 0.5rem;
-        border-radius: 0.25rem;
-        color: var(--text-color);
-    }
-
-    /* Form elements */
-    .stTextInput > div > div > input,
-    .stTextArea > div > div > textarea {
-        border-radius: 0.5rem;
-        border: 2px solid var(--background-color);
-        padding: 0.75rem;
-        transition: border-color 0.3s ease;
-    }
-
-    .stTextInput > div > div > input:focus,
-    .stTextArea > div > div > textarea:focus {
-        border-color: var(--primary-color);
-        outline: none;
-    }
-
-    /* Mobile responsiveness */
-    @media (max-width: 768px) {
-        .main-header {
-            font-size: 1.75rem;
-            padding: 1rem;
-        }
-        
-        .module-header {
-            font-size: 1.5rem;
-        }
-        
-        .card {
-            padding: 1rem;
-        }
-        
-        .button-primary,
-        .button-success,
-        .button-warning {
-            padding: 0.5rem 0.75rem;
-        }
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Initialize session states
-if 'page' not in st.session_state:
-    st.session_state.page = 'HOME'
-if 'completed_scenarios' not in st.session_state:
-    st.session_state.completed_scenarios = []
-if 'donation_info' not in st.session_state:
-    st.session_state.donation_info = {'name': '', 'phone': '', 'email': '', 'bank': '', 'amount': ''}
-if 'confirm_donation' not in st.session_state:
-    st.session_state.confirm_donation = False
-if 'donation_successful' not in st.session_state:
-    st.session_state.donation_successful = False
-if 'learn_progress' not in st.session_state:
-    st.session_state.learn_progress = 0
-if 'current_module' not in st.session_state:
-    st.session_state.current_module = 1
-if 'scenario_result' not in st.session_state:
-    st.session_state.scenario_result = None
-
-# Fixed navigation function with proper error handling
+def record_delta(state: AppState, in_fragment: bool) -> None:
+    if in_fragment:
+        state.fragment_deltas += 1
+    else:
+        state.deltas_this_run += 1
+
+COUNTING_DELTAS = DEBUG_STATS and count_deltas(functools.partial(record_delta, st.session_state.app))
+
+@st.cache_resource
+def load_stylesheet(theme: str) -> str:
+    """Build a theme's stylesheet once per process and return the HTML that applies it"""
+    if st.get_option("server.enableStaticServing"):
+        # Content-hashed file: the browser fetches it once, reruns only resend this tag
+        return f'<link rel="stylesheet" href="{STATIC_URL}/{write_stylesheet(theme)}">'
+    return f"<style>\n{build_stylesheet(theme)}</style>"
+
+with timed("stylesheet"):
+    st.markdown(load_stylesheet(st.session_state.app.theme), unsafe_allow_html=True)
+
+def get_state() -> AppState:
+    """Return this session's app state"""
+    return st.session_state.app
+
+def session_memory_bytes() -> int:
+    """Approximate memory held by this session's state, including widget values"""
+    return deep_sizeof(st.session_state.to_dict())
+
+@st.cache_resource
+def load_location_store() -> LocationStore:
+    """Open the location store once per process and share it across sessions"""
+    return LocationStore.open()
+
+@st.cache_resource
+def load_spatial_index(store_version: str) -> GridIndex:
+    """Build the location grid index once per dataset version"""
+    return GridIndex(load_location_store().geometries())
+
+@st.cache_resource
+def load_risk_table(store_version: str) -> RiskTable:
+    """Memory-map the precomputed risk table, shared through the page cache by all worker processes"""
+    return open_risk_table(load_location_store())
+
+@st.cache_resource
+def load_filter_choices(store_version: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Ward and risk level filter choices, queried once per dataset version"""
+    store = load_location_store()
+    present = set(store.risk_tiers())
+    return tuple(store.wards()), tuple(tier for tier in RISK_COLOR if tier in present)
+
+@st.cache_resource
+def load_risk_cards(store_version: str) -> RiskCardRenderer:
+    """Risk card HTML cache shared by all sessions for one dataset version"""
+    return RiskCardRenderer(store_version)
+
+@st.cache_resource
+def load_postal_codes() -> Dict[str, tuple]:
+    return load_postal_centroids()
+
+def emit_event(event_type: str, **fields) -> None:
+    """Queue a structured event for this session; never blocks the rerun"""
+    get_event_log().emit(event_type, session=get_state().session_id, **fields)
+
+def complete_module(module: int) -> None:
+    state = get_state()
+    emit_event("module_completed", module=module, first_time=not state.module_completed(module))
+    state.complete_module(module)
+
+def interaction(callback):
+    """Mark a widget callback as a user interaction for the rerun counter"""
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        state = get_state()
+        state.interactions += 1
+        state.runs_since_interaction = 0
+        return callback(*args, **kwargs)
+    return wrapper
+
+# Navigation runs as a button on_click callback, before the rerun the click triggers,
+# so the new page renders in that same script run without a second st.rerun()
+@interaction
 def navigate_to(page: str) -> None:
     """Navigate to a different page with proper state management"""
     try:
-        if page not in ['HOME', 'LEARN', 'PLAY', 'DONATE', 'CHECK', 'SOURCE', 'CLOSE']:
+        if page not in PAGES:
             raise ValueError(f"Invalid page: {page}")
         
-        st.session_state.page = page
+        state = get_state()
+        emit_event("navigate", page=page, previous=state.page)
+        state.page = page
         
         # Reset relevant session states
         if page == 'PLAY':
-            st.session_state.completed_scenarios = []
-            st.session_state.current_scenario = None
-            st.session_state.scenario_result = None
+            start_scenario_round()
         elif page == 'DONATE':
-            reset_donation()
+            state.reset_donation()
         elif page == 'LEARN':
-            st.session_state.learn_progress = 0
-            st.session_state.current_module = 1
+            state.reset_learning()
         
         logger.info(f"Navigated to {page}")
-        st.rerun()
     except Exception as e:
         logger.error(f"Navigation error: {str(e)}")
         st.error("An error occurred during navigation. Please try again.")
 
-def reset_donation():
-    st.session_state.donation_info = {'name': '', 'phone': '', 'email': '', 'bank': '', 'amount': ''}
-    st.session_state.confirm_donation = False
-    st.session_state.donation_successful = False
+@st.cache_resource
+def load_scenario_bank() -> ScenarioBank:
+    """Load and index the scenario bank once per process"""
+    return ScenarioBank.load()
+
+def start_scenario_round():
+    """Draw a fresh set of scenarios for this session"""
+    get_state().start_scenario_round(load_scenario_bank().draw(SCENARIOS_PER_SESSION))
+
+@interaction
+def play_again():
+    start_scenario_round()
+
+@interaction
+def select_module(module: int):
+    get_state().current_module = module
+
+@interaction
+def select_scenario(scenario_id: Optional[str]):
+    """Open a scenario, or return to scenario selection with None"""
+    state = get_state()
+    state.current_scenario = scenario_id
+    state.scenario_result = None
+
+@interaction
+def submit_scenario_answer(scenario_id: str):
+    answer = st.session_state[f"answer_{scenario_id}"]
+    correct = check_scenario_answer(scenario_id, answer)
+    emit_event("scenario_answered", scenario=scenario_id, answer=answer, correct=correct)
+    get_state().scenario_result = "correct" if correct else "incorrect"
+
+@interaction
+def edit_donation():
+    state = get_state()
+    state.confirm_donation = False
+    state.donation_failed = False
+
+def donation_record(state: AppState) -> DonationRecord:
+    donation = state.donation
+    return DonationRecord(
+        idempotency_key=state.donation_key,
+        amount_cents=donation.amount_cents(),
+        name=donation.name,
+        email=donation.email,
+        phone=donation.phone,
+        bank=donation.bank,
+    )
+
+def donation_recorded(state: AppState):
+    state.donation_failed = False
+    state.donation_successful = True
+    # Amount only; the donor's contact details stay out of the event trail
+    emit_event("donation_confirmed", amount=state.donation.amount)
+
+@interaction
+def confirm_donation():
+    """Record the donation, or with payments on, start charging it and let the page poll"""
+    state = get_state()
+    record = donation_record(state)
+    if PAYMENTS_ENABLED:
+        # The ledger write runs when the charge settles, even if this session has moved on
+        get_payments().start_charge(record.idempotency_key, record.amount_cents,
+                                    on_settled=functools.partial(get_ledger().record, record))
+        state.donation_failed = False
+        state.payment_pending = True
+        return
+    try:
+        inserted = get_ledger().record(record).result(timeout=LEDGER_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Could not record donation {state.donation_key}: {e}")
+        state.donation_failed = True
+        return
+    if inserted:
+        donation_recorded(state)
+    else:
+        # Already recorded by an earlier click
+        state.donation_successful = True
+
+@interaction
+def review_donation():
+    """Copy the submitted donation form into state and move to review if it is valid"""
+    state = get_state()
+    donation = state.donation
+    for name in ("name", "phone", "email", "bank", "amount"):
+        setattr(donation, name, st.session_state[f"donation_{name}"].strip())
+    state.confirm_donation = donation.is_complete() and donation.amount_cents() is not None
+    if state.confirm_donation:
+        state.donation_key = uuid.uuid4().hex
+
+@interaction
+def change_theme():
+    get_state().theme = st.session_state.theme_choice
+
+@interaction
+def start_new_donation():
+    get_state().reset_donation()
+
+@st.cache_resource
+def load_similarity_grader() -> SimilarityGrader:
+    """Vectorize the reference answers once per process"""
+    return SimilarityGrader()
+
+def answer_is_on_track(module: int, text: str) -> bool:
+    """Grade a Learn free-text answer using the configured grading mode"""
+    if GRADING_MODE == "similarity":
+        return load_similarity_grader().similarity(module, text) >= SIMILARITY_PASS_THRESHOLD
+    return grade_answer(module, text).score > 0
 
 def next_module():
-    if st.session_state.current_module < 3:
-        st.session_state.current_module += 1
-        st.session_state.learn_progress = (st.session_state.current_module - 1) * 33.33
+    state = get_state()
+    if state.current_module < LEARN_MODULES:
+        state.current_module += 1
+        state.learn_progress = (state.current_module - 1) * 33.33
     else:
-        st.session_state.learn_progress = 100
+        state.learn_progress = 100
 
 # Fixed scenario answer checking
 def check_scenario_answer(scenario: str, answer: str) -> bool:
@@ -327,49 +312,46 @@ def check_scenario_answer(scenario: str, answer: str) -> bool:
         if not scenario or not answer:
             raise ValueError("Scenario and answer must be provided")
         
-        correct_answers = {
-            "A": "C",
-            "B": "A",
-            "C": "B"
-        }
-        
-        return correct_answers.get(scenario) == answer
+        return load_scenario_bank().is_correct(scenario, answer)
     except Exception as e:
         logger.error(f"Error checking scenario answer: {str(e)}")
         return False
 
 # Fixed sidebar navigation
+def render_nav_buttons() -> None:
+    for item in NAV_ITEMS:
+        st.button(
+            item.label,
+            key=item.key,
+            help=item.tooltip,
+            use_container_width=True,
+            on_click=navigate_to,
+            args=(item.page,)
+        )
+
+# As a fragment, a sidebar click reruns only the navigation; the whole app
+# reruns only when the click actually changes the page
+@st.fragment
+def render_nav_fragment() -> None:
+    state = get_state()
+    state.fragment_runs += 1
+    for item in NAV_ITEMS:
+        if st.button(item.label, key=item.key, help=item.tooltip, use_container_width=True):
+            if item.page != state.page:
+                navigate_to(item.page)
+                st.rerun()
+
 def render_sidebar():
     """Render the sidebar with proper navigation"""
     with st.sidebar:
         # Logo with proper alt text
-        st.image(
-            "https://via.placeholder.com/150x150.png?text=Gentrification+App",
-            width=150,
-            caption="Gentrification Awareness App Logo"
-        )
+        render_logo(width=150, caption="Gentrification Awareness App Logo")
         
         st.markdown("### Navigation")
-        
-        # Navigation items with proper keys and tooltips
-        nav_items = [
-            ("🏠 Home", "home_nav", "HOME", "Return to the main page"),
-            ("📚 Learn", "learn_nav", "LEARN", "Start learning about gentrification"),
-            ("🎮 Play", "play_nav", "PLAY", "Test your knowledge with scenarios"),
-            ("💰 Donate", "donate_nav", "DONATE", "Support affordable housing initiatives"),
-            ("🔍 Check Your Area", "check_nav", "CHECK", "Check gentrification risk in your area"),
-            ("📋 Sources", "source_nav", "SOURCE", "View sources and references"),
-            ("❌ Close App", "close_nav", "CLOSE", "Exit the application")
-        ]
-        
-        for label, key, page, tooltip in nav_items:
-            if st.button(
-                label,
-                key=key,
-                help=tooltip,
-                use_container_width=True
-            ):
-                navigate_to(page)
+        if SIDEBAR_FRAGMENT:
+            render_nav_fragment()
+        else:
+            render_nav_buttons()
         
         st.markdown("---")
         st.markdown("### About")
@@ -377,36 +359,29 @@ def render_sidebar():
         This app is designed to educate about gentrification, its impacts, and potential solutions.
         Built with ❤️ for community awareness.
         """)
-
-# Sidebar Navigation
-with st.sidebar:
-    st.image("https://via.placeholder.com/150x150.png?text=Gentrification+App", width=150)
-    st.markdown("### Navigation")
-    
-    if st.button("🏠 Home", key="home_nav"):
-        navigate_to('HOME')
-    
-    if st.button("📚 Learn", key="learn_nav"):
-        navigate_to('LEARN')
-    
-    if st.button("🎮 Play", key="play_nav"):
-        navigate_to('PLAY')
-    
-    if st.button("💰 Donate", key="donate_nav"):
-        navigate_to('DONATE')
-    
-    if st.button("🔍 Check Your Area", key="check_nav"):
-        navigate_to('CHECK')
-    
-    if st.button("📋 Sources", key="source_nav"):
-        navigate_to('SOURCE')
-    
-    if st.button("❌ Close App", key="close_nav"):
-        navigate_to('CLOSE')
-    
-    st.markdown("---")
-    st.markdown("### About")
-    st.markdown("This app is designed to educate about gentrification, its impacts, and potential solutions.")
+        
+        st.selectbox(
+            "Theme",
+            THEME_CHOICES,
+            index=THEME_CHOICES.index(get_state().theme),
+            key="theme_choice",
+            on_change=change_theme,
+            format_func=str.title
+        )
+        
+        if DEBUG_STATS:
+            state = get_state()
+            st.caption(f"Session state: {session_memory_bytes():,} bytes")
+            st.caption(
+                f"Script runs: {state.script_runs} total, "
+                f"{state.runs_since_interaction} for the last of {state.interactions} interactions, "
+                f"{state.fragment_runs} fragment runs"
+            )
+            if COUNTING_DELTAS:
+                st.caption(f"Delta messages: {state.deltas_last_run} in the previous run, "
+                           f"{state.fragment_deltas} in fragment runs")
+            else:
+                st.caption("Delta messages: not counted, this Streamlit version has no enqueue hook")
 
 # Main content area
 def render_home():
@@ -415,8 +390,7 @@ def render_home():
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("""
+        render_card("""
         ### What is this app about?
         
         This interactive application helps you understand the concept of **gentrification**, its impact on communities, 
@@ -429,331 +403,280 @@ def render_home():
         
         Use the sidebar navigation to explore the different sections of the app.
         """)
-        st.markdown('</div>', unsafe_allow_html=True)
     
-    with col2:
-        st.markdown('<div class="card">', unsafe_allow_html=True)
+    with col2, card_container("quick-access"):
         st.markdown("### Quick Access")
         
-        if st.button("Learn About Gentrification", key="home_learn"):
-            navigate_to('LEARN')
+        st.button("Learn About Gentrification", key="home_learn", on_click=navigate_to, args=('LEARN',))
         
-        if st.button("Test Your Knowledge", key="home_play"):
-            navigate_to('PLAY')
+        st.button("Test Your Knowledge", key="home_play", on_click=navigate_to, args=('PLAY',))
         
-        if st.button("Support Affordable Housing", key="home_donate"):
-            navigate_to('DONATE')
+        st.button("Support Affordable Housing", key="home_donate", on_click=navigate_to, args=('DONATE',))
         
-        if st.button("Check Gentrification Risk", key="home_check"):
-            navigate_to('CHECK')
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.button("Check Gentrification Risk", key="home_check", on_click=navigate_to, args=('CHECK',))
 
 def render_learn():
+    state = get_state()
     st.markdown('<div class="main-header">Learning About Gentrification</div>', unsafe_allow_html=True)
     
     # Module selection buttons
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("### Select a Learning Module")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        if st.button("📕 Module 1: What is Gentrification?", 
-                    key="module1_btn", 
-                    use_container_width=True,
-                    help="Learn the basic concept of gentrification"):
-            st.session_state.current_module = 1
-            st.rerun()
-    
-    with col2:
-        if st.button("📗 Module 2: Who is Impacted?", 
-                    key="module2_btn", 
-                    use_container_width=True,
-                    help="Learn about who gentrification affects and how"):
-            st.session_state.current_module = 2
-            st.rerun()
-    
-    with col3:
-        if st.button("📘 Module 3: Solutions & Actions", 
-                    key="module3_btn", 
-                    use_container_width=True,
-                    help="Learn about potential solutions to gentrification"):
-            st.session_state.current_module = 3
-            st.rerun()
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Calculate progress based on which modules are completed
-    if not hasattr(st.session_state, 'completed_modules'):
-        st.session_state.completed_modules = set()
+    with card_container("modules"):
+        st.markdown("### Select a Learning Module")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.button("📕 Module 1: What is Gentrification?",
+                      key="module1_btn",
+                      use_container_width=True,
+                      help="Learn the basic concept of gentrification",
+                      on_click=select_module,
+                      args=(1,))
+        
+        with col2:
+            st.button("📗 Module 2: Who is Impacted?",
+                      key="module2_btn",
+                      use_container_width=True,
+                      help="Learn about who gentrification affects and how",
+                      on_click=select_module,
+                      args=(2,))
+        
+        with col3:
+            st.button("📘 Module 3: Solutions & Actions",
+                      key="module3_btn",
+                      use_container_width=True,
+                      help="Learn about potential solutions to gentrification",
+                      on_click=select_module,
+                      args=(3,))
+        
     
     # Progress bar (shows which modules have been visited)
-    progress_percent = len(st.session_state.completed_modules) * 33.33
-    if len(st.session_state.completed_modules) == 3:
+    progress_percent = state.completed_module_count() * 33.33
+    if state.completed_module_count() == LEARN_MODULES:
         progress_percent = 100
     
-    st.markdown('<div class="progress-container">', unsafe_allow_html=True)
-    st.markdown(f'<div class="progress-bar" style="width:{progress_percent}%;"></div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown(
+        f'<div class="progress-container"><div class="progress-bar" style="width:{progress_percent}%;"></div></div>',
+        unsafe_allow_html=True
+    )
     
     # Module 1
-    if st.session_state.current_module == 1:
+    if state.current_module == 1:
         st.markdown('<div class="module-header">Module 1: WHAT IS GENTRIFICATION?</div>', unsafe_allow_html=True)
         
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        user_explanation = st.text_area("Try explaining gentrification in your own words:", height=100)
-        
-        if st.button("Submit"):
-            words = ["process", "wealthy", "displacement", "displaced", "displace", "move out"]
-            count = sum(1 for word in words if word in user_explanation.lower())
-            
-            if count > 0:
-                st.success("You are on the right track!")
-            else:
-                st.warning("Not perfect! Allow me to help you!")
+        with card_container("module-1"):
+            user_explanation = st.text_area("Try explaining gentrification in your own words:", height=100)
             
-            st.markdown("""
-            **Gentrification** is the displacement of existing low income communities by wealthiest families 
-            or newcomers to the re-developeded area.
-            """)
-            
-            # Mark this module as completed
-            st.session_state.completed_modules.add(1)
-            
-            if st.button("Return to Module Selection"):
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+            if st.button("Submit"):
+                if answer_is_on_track(1, user_explanation):
+                    st.success("You are on the right track!")
+                else:
+                    st.warning("Not perfect! Allow me to help you!")
+                
+                st.markdown(REFERENCE_ANSWERS[1])
+                
+                # Mark this module as completed
+                complete_module(1)
+                
+                # Clicking reruns the page with the answer cleared
+                st.button("Return to Module Selection")
     
     # Module 2
-    elif st.session_state.current_module == 2:
+    elif state.current_module == 2:
         st.markdown('<div class="module-header">Module 2: WHO IS IMPACTED BY GENTRIFICATION? AND HOW?</div>', unsafe_allow_html=True)
         
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("""
-        Gentrification primarily impacts low-income residents and racial minorities (such as black and indigenous communities).
+        with card_container("module-2"):
+            st.markdown("""
+            Gentrification primarily impacts low-income residents and racial minorities (such as black and indigenous communities).
 
-        As the land is redeveloped, property values increase, leading to higher rents and housing costs for low-income residents. 
-        Eventually, these individuals are pushed out of their homes, often without any solid safety net or support to help them 
-        about displacement.
+            As the land is redeveloped, property values increase, leading to higher rents and housing costs for low-income residents. 
+            Eventually, these individuals are pushed out of their homes, often without any solid safety net or support to help them 
+            about displacement.
 
-        Often the puts the displaced people in a cycle of poverty and hardships without any proper help.
-        """)
-        
-        small_business_impact = st.radio(
-            "Do you think small businesses (i.e. a corner store) in low-income communities can also be impacted by gentrification?",
-            ["Select an answer", "Yes", "No"]
-        )
-        
-        if small_business_impact != "Select an answer":
-            if small_business_impact == "Yes":
-                st.success("Correct! Gentrification also impacts small businesses. Not just low income residents.")
-            else:
-                st.error("Incorrect! Gentrification also impacts small businesses. Not just low income residents.")
+            Often the puts the displaced people in a cycle of poverty and hardships without any proper help.
+            """)
             
-            business_explanation = st.text_area("How do you think small businesses are impacted?", height=100)
+            small_business_impact = st.radio(
+                "Do you think small businesses (i.e. a corner store) in low-income communities can also be impacted by gentrification?",
+                ["Select an answer", "Yes", "No"]
+            )
             
-            if st.button("Submit"):
-                words = ["rent", "higher", "loss", "customers", "less", "badly", "bad"]
-                count = sum(1 for word in words if word in business_explanation.lower())
-                
-                if count > 0:
-                    st.success("You're getting there!")
+            if small_business_impact != "Select an answer":
+                if small_business_impact == "Yes":
+                    st.success("Correct! Gentrification also impacts small businesses. Not just low income residents.")
                 else:
-                    st.warning("Not perfect! Allow me to help you!")
+                    st.error("Incorrect! Gentrification also impacts small businesses. Not just low income residents.")
                 
-                st.markdown("""
-                Small businesses in gentrifying areas often face rising rents and changing customer demographics 
-                (from low income to high income customers. The shop will not be able to cater to the new customer base), 
-                which can lead to displacement or forced closures, even if they have strong local ties in the community.
-                """)
+                business_explanation = st.text_area("How do you think small businesses are impacted?", height=100)
                 
-                # Mark this module as completed
-                st.session_state.completed_modules.add(2)
-                
-                if st.button("Return to Module Selection"):
-                    st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+                if st.button("Submit"):
+                    if answer_is_on_track(2, business_explanation):
+                        st.success("You're getting there!")
+                    else:
+                        st.warning("Not perfect! Allow me to help you!")
+                    
+                    st.markdown(REFERENCE_ANSWERS[2])
+                    
+                    # Mark this module as completed
+                    complete_module(2)
+                    
+                    # Clicking reruns the page with the answer cleared
+                    st.button("Return to Module Selection")
     
     # Module 3
-    elif st.session_state.current_module == 3:
+    elif state.current_module == 3:
         st.markdown('<div class="module-header">Module 3: SOLUTIONS AND ACTIONS MOVING FORWARD</div>', unsafe_allow_html=True)
         
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("""
-        Many neighborhoods and communities around the world are currently experiencing gentrification. 
-        Low income residents lack any influence or power in society, which leads them to only protest against these changes, 
-        but their efforts rarely stop developers from moving forward with redevelopment.
-        """)
-        
-        user_ideas = st.text_area("Do you have any ideas on combating gentrification?", height=100)
-        
-        if st.button("Submit"):
-            st.success("You have some interesting ideas!")
-            
+        with card_container("module-3"):
             st.markdown("""
-            ### CO-OP Housing as a Solution
-
-            The idea of CO-OP housing becomes more and more popular in areas undergoing gentrification.
-
-            A CO-OP housing is where a group of low income residents can own a property as a joint ownership. 
-            It helps keep housing affordable, gives people control in decisions, and protects communities from 
-            being pushed out by gentrification.
+            Many neighborhoods and communities around the world are currently experiencing gentrification. 
+            Low income residents lack any influence or power in society, which leads them to only protest against these changes, 
+            but their efforts rarely stop developers from moving forward with redevelopment.
             """)
             
-            # Mark this module as completed
-            st.session_state.completed_modules.add(3)
+            user_ideas = st.text_area("Do you have any ideas on combating gentrification?", height=100)
             
-            # Show completion message if all modules are completed
-            if len(st.session_state.completed_modules) == 3:
-                st.success("🎉 Congratulations! You've completed all learning modules!")
-            
-            if st.button("Return to Module Selection"):
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+            if st.button("Submit"):
+                st.success("You have some interesting ideas!")
+                
+                st.markdown("""
+                ### CO-OP Housing as a Solution
+
+                The idea of CO-OP housing becomes more and more popular in areas undergoing gentrification.
+
+                A CO-OP housing is where a group of low income residents can own a property as a joint ownership. 
+                It helps keep housing affordable, gives people control in decisions, and protects communities from 
+                being pushed out by gentrification.
+                """)
+                
+                # Mark this module as completed
+                complete_module(3)
+                
+                # Show completion message if all modules are completed
+                if state.completed_module_count() == LEARN_MODULES:
+                    st.success("🎉 Congratulations! You've completed all learning modules!")
+                
+                # Clicking reruns the page with the answer cleared
+                st.button("Return to Module Selection")
     
     # Add a home button at the bottom
-    if st.button("Return to Home", key="learn_home_btn"):
-        navigate_to('HOME')
-        st.rerun()
+    st.button("Return to Home", key="learn_home_btn", on_click=navigate_to, args=('HOME',))
 
 def render_play():
     st.markdown('<div class="main-header">Test Your Knowledge</div>', unsafe_allow_html=True)
     
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("""
+    render_card("""
     ### Scenario Challenge
     
     You will be given scenarios related to community development.
     Your job is to assess the chance of GENTRIFICATION in each scenario!
     
-    Complete all three scenarios to test your understanding.
+    Complete all the scenarios to test your understanding.
     """)
-    st.markdown('</div>', unsafe_allow_html=True)
     
-    # Available scenarios
-    available_scenarios = ["A", "B", "C"]
-    completed_scenarios = st.session_state.completed_scenarios
-    remaining_scenarios = [s for s in available_scenarios if s not in completed_scenarios]
+    state = get_state()
+    if not state.scenario_ids:
+        start_scenario_round()
     
-    if not remaining_scenarios:
+    if not state.remaining_scenarios():
         st.success("🎉 Congratulations! You've completed all scenarios!")
-        if st.button("Play Again"):
-            st.session_state.completed_scenarios = []
-            st.rerun()
-        if st.button("Return to Home"):
-            navigate_to('HOME')
-            st.rerun()
+        st.button("Play Again", on_click=play_again)
+        st.button("Return to Home", on_click=navigate_to, args=('HOME',))
         return
     
-    # Scenario selection
-    if 'current_scenario' not in st.session_state:
-        st.session_state.current_scenario = None
+    render_scenario_panel()
+
+# Picking an answer or moving between scenarios reruns only this panel,
+# not the stylesheet, sidebar and page header around it
+@st.fragment
+def render_scenario_panel():
+    state = get_state()
+    state.fragment_runs += 1
+    
+    # Scenarios drawn for this session
+    remaining_scenarios = state.remaining_scenarios()
+    if not remaining_scenarios:
+        # Round finished: the completion view lives outside the fragment
+        st.rerun()
+    
+    bank = load_scenario_bank()
     
-    if st.session_state.current_scenario is None:
+    if state.current_scenario is None:
         st.markdown("### Choose a Scenario")
         cols = st.columns(len(remaining_scenarios))
-        for i, scenario in enumerate(remaining_scenarios):
+        for i, scenario_id in enumerate(remaining_scenarios):
             with cols[i]:
-                if st.button(f"Scenario {scenario}", key=f"scenario_{scenario}"):
-                    st.session_state.current_scenario = scenario
-                    st.session_state.scenario_result = None
-                    st.rerun()
+                st.button(bank.get(scenario_id).title, key=f"scenario_{scenario_id}",
+                          on_click=select_scenario, args=(scenario_id,))
     else:
         # Display the current scenario
-        st.markdown('<div class="scenario-card">', unsafe_allow_html=True)
-        
-        if st.session_state.current_scenario == "A":
-            st.markdown("### Scenario A")
-            st.markdown("""
-            A historically working-class neighborhood in a large city started opening many new coffee shops, 
-            public spaces, and working spaces. Land values have begun to rise, and older apartment buildings 
-            are being renovated. A company has plans to move its headquarters into the area, bringing in many 
-            new, higher-income employees. 
+        with card_container("scenario", css_class="scenario-card"):
+            scenario = bank.get(state.current_scenario)
+            st.markdown(f"### {scenario.title}")
+            st.markdown(scenario.text)
+            options = scenario.options
+            correct_answer = scenario.answer
             
-            **What is the chance of Gentrification?**
-            """)
-            options = ["A) Low", "B) Medium", "C) High", "D) None of the Above"]
-            correct_answer = "C) High"
-            
-        elif st.session_state.current_scenario == "B":
-            st.markdown("### Scenario B")
-            st.markdown("""
-            In a new neighborhood, new commercial districts have arrived. A new Walmart and 
-            Ikea has opened up in the area. 
+            # Answer selection
+            st.radio("Select your answer:", options, key=f"answer_{state.current_scenario}")
             
-            **What is the chance of gentrification in this area?**
-            """)
-            options = ["A) Medium", "B) High", "C) Low", "D) None of the Above"]
-            correct_answer = "A) Medium"
+            st.button("Submit Answer", on_click=submit_scenario_answer, args=(scenario.id,))
             
-        else:  # Scenario C
-            st.markdown("### Scenario C")
-            st.markdown("""
-            A small suburb in Ontario has spent money on improving neighborhood parks and schools. 
-            They have also added more park benches and expanded their park space within the neighborhood.
+            # Show result if available
+            if state.scenario_result == "correct":
+                st.success("CORRECT! 🎉")
+                state.complete_scenario(state.current_scenario)
+                st.button("Continue", on_click=select_scenario, args=(None,))
+            elif state.scenario_result == "incorrect":
+                st.error(f"WRONG. The correct answer is {correct_answer}")
+                state.complete_scenario(state.current_scenario)
+                st.button("Continue", on_click=select_scenario, args=(None,))
             
-            **What is the chance of Gentrification?**
-            """)
-            options = ["A) Medium", "B) Low", "C) High", "D) None of the Above"]
-            correct_answer = "B) Low"
-        
-        # Answer selection
-        user_answer = st.radio("Select your answer:", options, key=f"answer_{st.session_state.current_scenario}")
-        
-        if st.button("Submit Answer"):
-            if user_answer == correct_answer:
-                st.session_state.scenario_result = "correct"
-            else:
-                st.session_state.scenario_result = "incorrect"
-            st.rerun()
-        
-        # Show result if available
-        if st.session_state.scenario_result == "correct":
-            st.success("CORRECT! 🎉")
-            st.session_state.completed_scenarios.append(st.session_state.current_scenario)
-            if st.button("Continue"):
-                st.session_state.current_scenario = None
-                st.session_state.scenario_result = None
-                st.rerun()
-        elif st.session_state.scenario_result == "incorrect":
-            st.error(f"WRONG. The correct answer is {correct_answer}")
-            st.session_state.completed_scenarios.append(st.session_state.current_scenario)
-            if st.button("Continue"):
-                st.session_state.current_scenario = None
-                st.session_state.scenario_result = None
-                st.rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
         
         # Option to go back to scenario selection
-        if st.button("Back to Scenario Selection"):
-            st.session_state.current_scenario = None
-            st.session_state.scenario_result = None
-            st.rerun()
+        st.button("Back to Scenario Selection", on_click=select_scenario, args=(None,))
+
+@st.fragment(run_every=PAYMENT_POLL_INTERVAL)
+def render_payment_status():
+    """Poll the background charge; only this fragment reruns until it settles or fails"""
+    state = get_state()
+    state.fragment_runs += 1
+    status = get_payments().status(state.donation_key)
+    if status is not None and status.state == PAYMENT_PENDING:
+        st.info("Processing your payment...")
+        return
+    state.payment_pending = False
+    if status is not None and status.state == PAYMENT_CHARGED:
+        # The donor was charged; the ledger write is retried in the background
+        logger.warning(f"Donation {state.donation_key} charged but not recorded yet: {status.detail}")
+        donation_recorded(state)
+    elif status is not None and status.state == PAYMENT_SETTLED:
+        donation_recorded(state)
+    else:
+        # No status at all means this process never started the charge, e.g. it restarted
+        logger.warning(f"Payment for donation {state.donation_key} failed: "
+                       f"{status.detail if status else 'unknown charge'}")
+        state.donation_failed = True
+    st.rerun()
 
 def render_donate():
+    state = get_state()
+    donation = state.donation
     st.markdown('<div class="main-header">Support Affordable Housing</div>', unsafe_allow_html=True)
     
-    if st.session_state.donation_successful:
-        st.markdown('<div class="donate-card">', unsafe_allow_html=True)
-        st.success(f"Thank You, {st.session_state.donation_info['name']}! Your donation of ${st.session_state.donation_info['amount']} has been processed.")
-        st.markdown("Your contribution will help fund affordable housing initiatives and support communities at risk of displacement.")
-        
-        if st.button("Make Another Donation"):
-            reset_donation()
-            st.rerun()
-        
-        if st.button("Return to Home"):
-            navigate_to('HOME')
-            st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+    if state.donation_successful:
+        with card_container("thanks", css_class="donate-card"):
+            st.success(f"Thank You, {donation.name}! Your donation of ${donation.amount} has been processed.")
+            st.markdown("Your contribution will help fund affordable housing initiatives and support communities at risk of displacement.")
+            
+            st.button("Make Another Donation", on_click=start_new_donation)
+            
+            st.button("Return to Home", on_click=navigate_to, args=('HOME',))
         return
     
     # Information about donations
-    if not st.session_state.confirm_donation:
-        st.markdown('<div class="donate-card">', unsafe_allow_html=True)
-        st.markdown("### What We Do With Your Donations")
-        st.markdown("""
+    if not state.confirm_donation:
+        render_card("### What We Do With Your Donations", """
         Your donations go towards helping to fund affordable housing! With your support, we can ensure 
         that people with the lowest incomes have a place which they can call home.
 
@@ -763,144 +686,160 @@ def render_donate():
         We have collaborated with Canadian NGOs such as Ottawa Community Land Trust and Team Interact to 
         make our Canadian vision come true in all communities. Step by step we are providing rental properties 
         for low income groups and with your help and donations we can go beyond our vision!
-        """)
-        st.markdown('</div>', unsafe_allow_html=True)
+        """, css_class="donate-card")
         
         # Donation form
-        st.markdown('<div class="donate-card">', unsafe_allow_html=True)
-        st.markdown("### Make a Donation")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.session_state.donation_info['name'] = st.text_input("Full Name", st.session_state.donation_info['name'])
-            st.session_state.donation_info['email'] = st.text_input("Email Address", st.session_state.donation_info['email'])
-            st.session_state.donation_info['bank'] = st.text_input("Bank Name", st.session_state.donation_info['bank'])
-        
-        with col2:
-            st.session_state.donation_info['phone'] = st.text_input("Phone Number", st.session_state.donation_info['phone'])
-            st.session_state.donation_info['amount'] = st.text_input("Donation Amount ($)", st.session_state.donation_info['amount'])
-        
-        # Validate form
-        all_fields_filled = all(st.session_state.donation_info.values())
-        amount_is_number = st.session_state.donation_info['amount'].isdigit() if st.session_state.donation_info['amount'] else False
-        
-        if st.button("Review Donation", disabled=not (all_fields_filled and amount_is_number)):
-            if not amount_is_number:
-                st.error("Donation amount must be a number")
-            else:
-                st.session_state.confirm_donation = True
-                st.rerun()
-        
-        if not all_fields_filled:
-            st.info("Please fill in all fields to proceed")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with card_container("form", css_class="donate-card"):
+            st.markdown("### Make a Donation")
+            
+            # Fields are batched in a form, so typing does not rerun the app;
+            # the values are read once, on submit
+            with st.form("donation_form", border=False):
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.text_input("Full Name", donation.name, key="donation_name")
+                    st.text_input("Email Address", donation.email, key="donation_email")
+                    st.text_input("Bank Name", donation.bank, key="donation_bank")
+                
+                with col2:
+                    st.text_input("Phone Number", donation.phone, key="donation_phone")
+                    st.text_input("Donation Amount ($)", donation.amount, key="donation_amount")
+                
+                st.form_submit_button("Review Donation", on_click=review_donation)
+            
+            # Validate the last submitted values
+            all_fields_filled = donation.is_complete()
+            amount_is_valid = donation.amount_cents() is not None
+            
+            if all_fields_filled and not amount_is_valid:
+                st.error(f"Donation amount must be a whole number of dollars from $1 to ${MAX_AMOUNT_CENTS // 100:,}")
+            
+            if not all_fields_filled:
+                st.info("Please fill in all fields to proceed")
     
     else:
         # Confirmation page
-        st.markdown('<div class="donate-card">', unsafe_allow_html=True)
-        st.markdown("### Review Your Donation")
-        
-        st.markdown("<div style='padding: 20px; background-color: #f8fafc; border-radius: 10px;'>", unsafe_allow_html=True)
-        st.markdown(f"**Name:** {st.session_state.donation_info['name']}")
-        st.markdown(f"**Phone Number:** {st.session_state.donation_info['phone']}")
-        st.markdown(f"**Email:** {st.session_state.donation_info['email']}")
-        st.markdown(f"**Bank:** {st.session_state.donation_info['bank']}")
-        st.markdown(f"**Donation Amount:** ${st.session_state.donation_info['amount']}")
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("Confirm Donation"):
-                st.session_state.donation_successful = True
-                st.rerun()
-        
-        with col2:
-            if st.button("Edit Information"):
-                st.session_state.confirm_donation = False
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+        with card_container("review", css_class="donate-card"):
+            st.markdown("### Review Your Donation")
+            
+            # Raw HTML block: the donor's own values are escaped
+            st.markdown(
+                "<div style='padding: 20px; background-color: #f8fafc; border-radius: 10px;'>\n\n"
+                f"**Name:** {escape(donation.name)}  \n"
+                f"**Phone Number:** {escape(donation.phone)}  \n"
+                f"**Email:** {escape(donation.email)}  \n"
+                f"**Bank:** {escape(donation.bank)}  \n"
+                f"**Donation Amount:** ${escape(donation.amount)}\n\n"
+                "</div>",
+                unsafe_allow_html=True
+            )
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.button("Confirm Donation", on_click=confirm_donation, disabled=state.payment_pending)
+            
+            with col2:
+                st.button("Edit Information", on_click=edit_donation, disabled=state.payment_pending)
+            
+            if state.payment_pending:
+                render_payment_status()
+            elif state.donation_failed:
+                st.error("We could not process your donation. Please try again.")
 
 def render_check():
     st.markdown('<div class="main-header">Check Gentrification Risk in Your Area</div>', unsafe_allow_html=True)
     
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("""
+    render_card("""
     ### Gentrification Risk Assessment
     
     In this section, you can check the chance of gentrification in various areas in Ottawa.
     With this information, you can be pro-active rather than re-active!
     
-    Select a location below to learn about its gentrification risk profile.
+    Filter by ward or risk level, or search by name, to learn about an area's gentrification risk profile.
     """)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Available locations
-    locations = {
-        "ELGIN STREET": {
-            "description": "Elgin Street is a street in the Downtown core of Ottawa. Currently it faces a lot of urban stress such as low maintenance, some garbage, drugs and smoking. Lot of the land use is mixed (commercial and residential). As a part of the downtown core, it has a medium chance of getting gentrified and redeveloped.",
-            "risk": "Medium"
-        },
-        "KANATA LAKES": {
-            "description": "Kanata Lakes- a cluster of suburban neighbourhoods, parks, greenspace, and golf courses to the west of downtown Ottawa. Kanata Lakes is already a high end neighborhood close to many commercial centers and large tech companies. The chance of major gentrification is low.",
-            "risk": "Low"
-        },
-        "MERIVALE ROAD": {
-            "description": "Merivale Road, a significant road in Ottawa connecting schools, housing, restaurants, shops and malls all in one road. It includes many transport links. Going further down the road, there is an industrial park as well as a farm. Considering this, Merivale Road will not be going through gentrification anytime soon. However it is a possibility later on.",
-            "risk": "Low-Medium"
-        },
-        "BEAVERBROOK": {
-            "description": "Beaverbrook is another small cluster of neighborhoods to the right of Kanata Lakes. It is an older religion than Kanata Lakes and has low income and Co-Op housing. Due to this fact, the area may be redeveloped in the future. The chance of redevelopment and gentrification is high.",
-            "risk": "High"
-        },
-        "LANSDOWNE": {
-            "description": "Lansdowne- located in the very core of Ottawa downtown, it is a very popular area for visitors. Home to Lansdowne Park which is a world-class attraction with modern services combined with heritage sites. The land value is already high. Any gentrification in the future is very low.",
-            "risk": "Very Low"
-        }
-    }
     
-    # Create tabs for locations
-    tabs = st.tabs(list(locations.keys()))
-    
-    for i, (location_name, location_data) in enumerate(locations.items()):
-        with tabs[i]:
-            # Risk color and background mapping
-            risk_color = {
-                "Very Low": "#10B981",  # Green
-                "Low": "#34D399",  # Light Green
-                "Low-Medium": "#FBBF24",  # Yellow
-                "Medium": "#F59E0B",  # Orange
-                "High": "#DC2626"  # Red
-            }
-            
-            # Background colors for the cards (light colors that contrast with text)
-            bg_color = "#FFFFFF"  # White background for all cards
+    store = load_location_store()
+    risk_table = load_risk_table(store.version)
+    risk_cards = load_risk_cards(store.version)
+    
+    # Point lookup through the shared spatial index
+    st.markdown("### Find Areas Near You")
+    query = st.text_input(
+        "Enter a postal code (e.g. K2P 1L4) or coordinates (e.g. 45.4165, -75.6880)",
+        key="check_point"
+    ).strip()
+    
+    if query:
+        point = parse_query(query, load_postal_codes())
+        if point is None:
+            st.warning("We couldn't find that postal code or read those coordinates. Please try again.")
+        else:
+            index = load_spatial_index(store.version)
+            lon, lat = point
+            containing = index.containing(lon, lat)
+            nearest = index.nearest(lon, lat, k=NEAREST_LOCATIONS)
             
-            # Text color - ensuring dark text for better readability
-            text_color = "#1F2937"  # Dark gray text for all content
+            if containing:
+                st.success(f"This point is inside: {', '.join(containing)}")
             
-            # Card with improved contrast and font visibility
-            st.markdown(f"""
-            <div style='padding: 20px; background-color: {bg_color}; border-radius: 10px; border-left: 5px solid {risk_color.get(location_data["risk"], "#6B7280")}; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);'>
-                <h3 style='margin-top: 0; color: {text_color}; font-weight: 700;'>{location_name}</h3>
-                <p style='color: {text_color}; font-size: 16px; line-height: 1.6;'>{location_data["description"]}</p>
-                <div style='background-color: #F3F4F6; padding: 10px; border-radius: 5px; margin-top: 15px;'>
-                    <p style='margin: 0; font-weight: 600; color: {text_color};'>
-                        Gentrification Risk: 
-                        <span style='color: {risk_color.get(location_data["risk"], "#6B7280")}; 
-                               background-color: rgba({",".join(map(str, [int(risk_color.get(location_data["risk"], "#6B7280")[1:3], 16), 
-                                                                        int(risk_color.get(location_data["risk"], "#6B7280")[3:5], 16), 
-                                                                        int(risk_color.get(location_data["risk"], "#6B7280")[5:7], 16)]))}, 0.15); 
-                               padding: 3px 8px; 
-                               border-radius: 4px; 
-                               font-weight: 700;'>
-                            {location_data["risk"]}
-                        </span>
-                    </p>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            for name, distance_km in nearest:
+                risk = risk_table.lookup(name)
+                if risk is None:
+                    # Indexed but missing from the risk table
+                    continue
+                risk_tier, _ = risk
+                risk_hex = RISK_COLOR.get(risk_tier, UNKNOWN_RISK_COLOR)
+                st.markdown(
+                    f"**{name}** ({risk_table.ward(name)}) - {distance_km:.1f} km away - "
+                    f"Gentrification Risk: <span style='color: {risk_hex}; font-weight: 700;'>{risk_tier}</span>",
+                    unsafe_allow_html=True
+                )
+    
+    st.markdown("### Browse Locations")
+    
+    # Filters are answered by indexed queries, so only the visible page is ever loaded
+    wards, risk_tiers = load_filter_choices(store.version)
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        ward = st.selectbox("Ward", ("All wards",) + wards, key="check_ward")
+    
+    with col2:
+        risk = st.selectbox("Risk level", ("All risk levels",) + risk_tiers, key="check_risk")
+    
+    with col3:
+        name_prefix = st.text_input("Search by name", key="check_search").strip()
+    
+    filters = {
+        "ward": None if ward == "All wards" else ward,
+        "risk": None if risk == "All risk levels" else risk,
+        "name_prefix": name_prefix or None
+    }
+    total = store.count(**filters)
+    
+    if total == 0:
+        st.info("No locations match your filters.")
+    else:
+        page_count = -(-total // LOCATIONS_PER_PAGE)
+        page_number = 1
+        if page_count > 1:
+            page_number = st.selectbox(
+                "Page",
+                range(1, page_count + 1),
+                format_func=lambda n: f"Page {n} of {page_count} ({total} locations)"
+            )
+        
+        locations = store.page(offset=(page_number - 1) * LOCATIONS_PER_PAGE, limit=LOCATIONS_PER_PAGE, **filters)
+        
+        # Create tabs for the current page of locations only
+        tabs = st.tabs([location.name for location in locations])
+        
+        for tab, location in zip(tabs, locations):
+            with tab:
+                risk_tier, risk_score = risk_table.lookup(location.name) or (location.risk, location.risk_score)
+                risk_cards.render(location, risk_tier, risk_score)
     
     # Coming soon section with improved visibility
     st.markdown("""
@@ -919,9 +858,6 @@ def render_check():
 def render_source():
     st.markdown('<div class="main-header">Sources & References</div>', unsafe_allow_html=True)
     
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("### Academic & Media Sources")
-    
     sources = [
         "Duncan, Pamela, et al. 'Housing: how 14 years of Tory rule have changed Britain – in charts'. The Guardian, 1 July 2024, https://www.theguardian.com/politics/article/2024/jul/01/housing-how-14-years-of-tory-rule-have-changed-britain-in-charts?utm_source. Accessed 23 April 2025.",
         "REtripster, et al. What Is 'Gentrification?' YouTube, 16 June 2020, youtu.be/s07D45uHmVY?si=ZcSF7GEybjK4PyEK. Accessed 23 April 23, 2025.",
@@ -932,12 +868,9 @@ def render_source():
         "Canada, Housing Federation. 'About Co-op Housing About Co-op Housing.' CHF Canada, https://chfcanada.coop/about-co-op-housing/. Accessed 23 April 2025."
     ]
     
-    for i, source in enumerate(sources):
-        st.markdown(f'<div class="source-item">{i+1}. {source}</div>', unsafe_allow_html=True)
+    source_items = "\n".join(f'<div class="source-item">{i+1}. {source}</div>' for i, source in enumerate(sources))
     
-    # Additional resources section
-    st.markdown("### Additional Resources")
-    st.markdown("""
+    render_card("### Academic & Media Sources", source_items, "### Additional Resources", """
     Looking for more information on gentrification and affordable housing solutions? 
     Check out these additional resources:
     
@@ -946,47 +879,122 @@ def render_source():
     - Academic research on the socioeconomic impacts of gentrification
     - Community-led solutions and success stories
     """)
-    st.markdown('</div>', unsafe_allow_html=True)
 
 def render_close():
     st.markdown('<div class="main-header">Thank You for Using the Gentrification Awareness App</div>', unsafe_allow_html=True)
     
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("""
-    ### We hope you found this app informative and educational!
-    
-    Thanks for taking the time to learn about gentrification and its impacts on communities.
-    
-    Remember, awareness is the first step toward creating positive change in our communities.
+    with card_container("close"):
+        st.markdown("""
+        ### We hope you found this app informative and educational!
+        
+        Thanks for taking the time to learn about gentrification and its impacts on communities.
+        
+        Remember, awareness is the first step toward creating positive change in our communities.
+        
+        Would you like to:
+        """)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.button("Return to Home Page", on_click=navigate_to, args=('HOME',))
+        
+        with col2:
+            if st.button("Exit Application"):
+                st.markdown("Closing application... Thank you for using the Gentrification Awareness App!")
+                st.balloons()
+
+def render_donation_totals():
+    campaign = donation_totals()
+    st.markdown("### Donations")
+    col1, col2 = st.columns(2)
+    col1.metric("Total raised", f"${campaign['total_cents'] / 100:,.2f}")
+    col2.metric("Donations", f"{campaign['count']:,}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.dataframe(
+            [{"day": row["day"], "donations": row["count"], "total ($)": row["total_cents"] / 100}
+             for row in campaign["by_day"]],
+            hide_index=True,
+            width="stretch"
+        )
+    with col2:
+        st.dataframe(
+            [{"bank": row["bank"], "donations": row["count"], "total ($)": row["total_cents"] / 100}
+             for row in campaign["by_bank"]],
+            hide_index=True,
+            width="stretch"
+        )
+    st.caption(f"Export the ledger as CSV with: python donation_ledger.py -o donations.csv ({LEDGER_PATH})")
+
+def unlock_admin():
+    # Constant-time comparison, so response timing does not leak the token
+    entered = st.session_state.admin_token.encode()
+    unlocked = bool(ADMIN_TOKEN) and hmac.compare_digest(entered, ADMIN_TOKEN.encode())
+    if not unlocked:
+        logger.warning("Rejected ADMIN page token")
+    get_state().admin_unlocked = unlocked
+    st.session_state.admin_token_rejected = not unlocked
+
+def render_admin():
+    st.markdown('<div class="main-header">Admin</div>', unsafe_allow_html=True)
+    
+    if not ADMIN_TOKEN:
+        st.info("The admin page is disabled. Start the app with GENT_ADMIN_TOKEN set to enable it.")
+        return
     
-    Would you like to:
-    """)
+    if not get_state().admin_unlocked:
+        with st.form("admin_login"):
+            st.text_input("Admin token", type="password", key="admin_token")
+            st.form_submit_button("Unlock", on_click=unlock_admin)
+        if st.session_state.get("admin_token_rejected"):
+            st.error("That token is not valid.")
+        return
     
-    col1, col2 = st.columns(2)
+    render_donation_totals()
     
-    with col1:
-        if st.button("Return to Home Page"):
-            navigate_to('HOME')
-            st.rerun()
+    st.markdown("### Render Timings")
+    if not INSTRUMENTED:
+        st.info("Instrumentation is off. Start the app with GENT_INSTRUMENT=1 to collect render timings.")
+        return
     
-    with col2:
-        if st.button("Exit Application"):
-            st.markdown("Closing application... Thank you for using the Gentrification Awareness App!")
-            st.balloons()
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.caption(f"Process-wide, across all sessions since this server process started (pid {os.getpid()})")
+    st.dataframe(
+        [{"step": name, **{key: round(value, 2) for key, value in stats.items()}}
+         for name, stats in summaries().items()],
+        hide_index=True,
+        width="stretch"
+    )
+    st.download_button("Download Prometheus metrics", prometheus_text(), file_name="metrics.prom")
+    
+    event_log = get_event_log()
+    st.caption(
+        f"Events: {event_log.written:,} written, {event_log.queued:,} queued, "
+        f"{event_log.dropped:,} dropped -> {event_log.path}"
+    )
+    st.caption(f"Also written every {WRITE_INTERVAL:.0f}s to {process_metrics_path()}")
+
+# Page registry: page key -> render function
+PAGES = {
+    'HOME': render_home,
+    'LEARN': render_learn,
+    'PLAY': render_play,
+    'DONATE': render_donate,
+    'CHECK': render_check,
+    'SOURCE': render_source,
+    'CLOSE': render_close,
+    # Not in the navigation; see the session state initialisation
+    'ADMIN': render_admin,
+}
+
+# Sidebar goes after the registry: in fragment mode its buttons route directly
+with timed("sidebar"):
+    render_sidebar()
 
 # Main page selector
-if st.session_state.page == 'HOME':
-    render_home()
-elif st.session_state.page == 'LEARN':
-    render_learn()
-elif st.session_state.page == 'PLAY':
-    render_play()
-elif st.session_state.page == 'DONATE':
-    render_donate()
-elif st.session_state.page == 'CHECK':
-    render_check()
-elif st.session_state.page == 'SOURCE':
-    render_source()
-elif st.session_state.page == 'CLOSE':
-    render_close()
+render_page = PAGES.get(get_state().page, render_home)
+with timed(render_page.__name__):
+    render_page()
+
+observe("rerun", time.perf_counter() - run_started)
+maybe_write_prometheus()
@@ -0,0 +1,130 @@
+"""Offline batch grading of learner responses against the Learn module rubrics.
+
+Reads a JSONL file (or stdin) one record at a time, grades each record's text
+with the same rubrics used by the app, and streams the records back out with
+their scores attached. Lines are parsed and graded in a process pool, in
+order, so output line N always corresponds to input line N. Input is handed
+to the pool in bounded windows, so memory does not grow with the file size.
+
+Usage:
+    python grade_cli.py responses.jsonl -o graded.jsonl
+    python grade_cli.py requests.jsonl --text-field body --module 1
+    python grade_cli.py responses.jsonl --mode similarity
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from rubrics import grade
+from similarity import SIMILARITY_PASS_THRESHOLD, SimilarityGrader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 256
+PROGRESS_EVERY = 100_000
+# Chunks per worker handed to the pool at a time
+WINDOW_CHUNKS_PER_WORKER = 4
+
+# Built lazily in each worker process
+_similarity_grader: Optional[SimilarityGrader] = None
+
+
+def grade_line(line: str, text_field: str, module_field: str, default_module: Optional[int],
+               mode: str = "keywords") -> Tuple[bool, str]:
+    """Grade one JSONL record; returns (is_error, record re-serialised with score fields added)"""
+    global _similarity_grader
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise TypeError(f"Expected a JSON object, got {type(record).__name__}")
+        module = int(record.get(module_field, default_module))
+        text = str(record.get(text_field) or "")
+        if mode == "similarity":
+            if _similarity_grader is None:
+                _similarity_grader = SimilarityGrader()
+            similarity = _similarity_grader.similarity(module, text)
+        else:
+            result = grade(module, text)
+    except (ValueError, TypeError) as e:
+        return True, json.dumps({"error": str(e), "input": line.rstrip("\n")})
+    if mode == "similarity":
+        record["similarity"] = round(similarity, 4)
+        record["passed"] = similarity >= SIMILARITY_PASS_THRESHOLD
+    else:
+        record["score"] = result.score
+        record["matched"] = list(result.concepts)
+        record["passed"] = result.score > 0
+    return False, json.dumps(record, ensure_ascii=False)
+
+
+def iter_lines(stream: IO[str]) -> Iterable[str]:
+    return (line for line in stream if line.strip())
+
+
+def iter_windows(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Consecutive lists of up to ``size`` lines"""
+    lines = iter(lines)
+    while True:
+        window = list(islice(lines, size))
+        if not window:
+            return
+        yield window
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Grade learner responses in bulk")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of responses, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path, or - for stdout")
+    parser.add_argument("--text-field", default="response", help="Field holding the learner's answer")
+    parser.add_argument("--module-field", default="module", help="Field holding the Learn module number")
+    parser.add_argument("--module", type=int, help="Module to use when a record has no module field")
+    parser.add_argument("--mode", choices=("keywords", "similarity"), default="keywords",
+                        help="Rubric keyword matching or TF-IDF similarity to the reference answer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    worker = partial(grade_line, text_field=args.text_field, module_field=args.module_field,
+                     default_module=args.module, mode=args.mode)
+    # imap's feeder thread reads its whole input ahead, so feed it a window at a time
+    window_size = args.workers * args.chunk_size * WINDOW_CHUNKS_PER_WORKER
+    graded = errors = 0
+    started = time.perf_counter()
+    try:
+        with Pool(args.workers) as pool:
+            for window in iter_windows(iter_lines(source), window_size):
+                for is_error, output in pool.imap(worker, window, chunksize=args.chunk_size):
+                    sink.write(output + "\n")
+                    graded += 1
+                    errors += is_error
+                    if graded % PROGRESS_EVERY == 0:
+                        rate = graded / (time.perf_counter() - started)
+                        logger.info(f"Graded {graded} responses ({rate:,.0f}/s)")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.perf_counter() - started
+    rate = graded / elapsed if elapsed else 0.0
+    logger.info(
+        f"Graded {graded} responses ({errors} errors) in {elapsed:.2f}s "
+        f"with {args.workers} workers: {rate:,.0f} responses/s"
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
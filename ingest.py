@@ -0,0 +1,299 @@
+"""Streaming ingestion of municipal parcel and assessment exports.
+
+Parcel records are read lazily from CSV or GeoJSON, grouped into fixed-size
+chunks and folded into per-neighbourhood running aggregates, so peak memory
+depends on the chunk size and the number of neighbourhoods rather than on the
+size of the export. The result is written as a compact columnar ``.npz``
+artifact that the location store merges into the Check page data.
+
+Usage:
+    python ingest.py assessments.csv
+    python ingest.py parcels.geojson --output data/neighbourhoods.npz
+"""
+import argparse
+import csv
+import heapq
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from resource_usage import peak_rss_mb
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES_PATH = Path(__file__).parent / "data" / "neighbourhoods.npz"
+
+DEFAULT_CHUNK_SIZE = 10_000
+READ_SIZE = 1 << 16
+# Number of rent deltas sampled per neighbourhood for the median estimate
+MEDIAN_SAMPLE_SIZE = 2048
+
+# Column (CSV) or property (GeoJSON) names in the municipal exports
+FIELDS = {
+    "id": "parcel_id",
+    "neighbourhood": "neighbourhood",
+    "assessment": "assessed_value",
+    "prior_assessment": "prior_assessed_value",
+    "rent": "monthly_rent",
+    "prior_rent": "prior_monthly_rent",
+    "low_income": "low_income",
+    "coop": "coop",
+}
+
+ARTIFACT_COLUMNS = (
+    "parcels", "rent_growth", "value_change", "low_income_share", "coop_share", "median_rent_delta"
+)
+
+Record = Dict[str, object]
+
+
+def _to_float(value: object) -> Optional[float]:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if np.isfinite(result) else None
+
+
+def _to_flag(value: object) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+@dataclass
+class NeighbourhoodStats:
+    """Running, mergeable aggregate for one neighbourhood"""
+    parcels: int = 0
+    value_change_sum: float = 0.0
+    value_change_n: int = 0
+    rent_growth_sum: float = 0.0
+    rent_growth_n: int = 0
+    low_income: int = 0
+    coop: int = 0
+    # Bottom-k sample keyed by a stable hash of the parcel id: deterministic,
+    # bounded, and mergeable across chunks or processes
+    rent_delta_sample: List[Tuple[int, float]] = field(default_factory=list)
+
+    def add(self, parcel_key: str, record: Record) -> None:
+        self.parcels += 1
+        self.low_income += _to_flag(record.get(FIELDS["low_income"]))
+        self.coop += _to_flag(record.get(FIELDS["coop"]))
+
+        assessment = _to_float(record.get(FIELDS["assessment"]))
+        prior_assessment = _to_float(record.get(FIELDS["prior_assessment"]))
+        if assessment is not None and prior_assessment:
+            self.value_change_sum += (assessment / prior_assessment - 1) * 100
+            self.value_change_n += 1
+
+        rent = _to_float(record.get(FIELDS["rent"]))
+        prior_rent = _to_float(record.get(FIELDS["prior_rent"]))
+        if rent is not None and prior_rent:
+            self.rent_growth_sum += (rent / prior_rent - 1) * 100
+            self.rent_growth_n += 1
+            self._sample(zlib.crc32(parcel_key.encode()), rent - prior_rent)
+
+    def _sample(self, key: int, value: float) -> None:
+        # Max-heap on the hash so the largest hash is evicted first
+        item = (-key, value)
+        if len(self.rent_delta_sample) < MEDIAN_SAMPLE_SIZE:
+            heapq.heappush(self.rent_delta_sample, item)
+        elif item > self.rent_delta_sample[0]:
+            heapq.heapreplace(self.rent_delta_sample, item)
+
+    def merge(self, other: "NeighbourhoodStats") -> None:
+        self.parcels += other.parcels
+        self.value_change_sum += other.value_change_sum
+        self.value_change_n += other.value_change_n
+        self.rent_growth_sum += other.rent_growth_sum
+        self.rent_growth_n += other.rent_growth_n
+        self.low_income += other.low_income
+        self.coop += other.coop
+        for item in other.rent_delta_sample:
+            self._sample(-item[0], item[1])
+
+    def summary(self) -> Dict[str, float]:
+        deltas = [value for _, value in self.rent_delta_sample]
+        return {
+            "parcels": self.parcels,
+            "rent_growth": self.rent_growth_sum / self.rent_growth_n if self.rent_growth_n else np.nan,
+            "value_change": self.value_change_sum / self.value_change_n if self.value_change_n else np.nan,
+            "low_income_share": self.low_income / self.parcels if self.parcels else np.nan,
+            "coop_share": self.coop / self.parcels if self.parcels else np.nan,
+            "median_rent_delta": float(np.median(deltas)) if deltas else np.nan,
+        }
+
+
+def iter_csv_records(path: Path) -> Iterator[Record]:
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def iter_geojson_records(path: Path, read_size: int = READ_SIZE) -> Iterator[Record]:
+    """Yield feature properties from a GeoJSON FeatureCollection or newline-delimited GeoJSON
+
+    The file is decoded incrementally, one feature at a time, so only the
+    current read buffer and feature are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(read_size)
+        stripped = buffer.lstrip()
+        if stripped.startswith("{") and '"FeatureCollection"' not in buffer and '"features"' not in buffer:
+            # Newline-delimited: one feature per line
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line).get("properties") or {}
+            return
+
+        # Skip ahead to the opening bracket of the "features" array
+        while True:
+            start = buffer.find('"features"')
+            if start != -1:
+                bracket = buffer.find("[", start)
+                if bracket != -1:
+                    buffer = buffer[bracket + 1:]
+                    break
+            more = f.read(read_size)
+            if not more:
+                raise ValueError(f"No features array found in {path}")
+            # Keep enough of the old buffer to match a key split across reads
+            buffer = (buffer[start:] if start != -1 else buffer[-len('"features"'):]) + more
+
+        pos = 0
+        while True:
+            # Skip separators between features
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(read_size)
+                if not more:
+                    raise
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield feature.get("properties") or {}
+            pos = end
+            if pos > read_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_records(path: Path) -> Iterator[Record]:
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return iter_csv_records(path)
+    if suffix in (".geojson", ".json", ".geojsonl", ".ndjson"):
+        return iter_geojson_records(path)
+    raise ValueError(f"Unsupported input format: {path.suffix}")
+
+
+def iter_chunks(records: Iterable[Record], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Record]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_name(name: object) -> str:
+    return " ".join(str(name).split()).upper()
+
+
+def aggregate_records(records: Iterable[Record], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      include: Optional[Callable[[str], bool]] = None) -> Dict[str, NeighbourhoodStats]:
+    """Fold parcel records into per-neighbourhood stats
+
+    ``include`` optionally restricts aggregation to a subset of neighbourhoods.
+    """
+    stats: Dict[str, NeighbourhoodStats] = {}
+    for chunk in iter_chunks(records, chunk_size):
+        for record in chunk:
+            name = normalize_name(record.get(FIELDS["neighbourhood"]) or "")
+            if not name or (include is not None and not include(name)):
+                continue
+            # Records without an id are keyed by their content, which keeps the
+            # median sample independent of how the input was split up
+            parcel_key = str(record.get(FIELDS["id"]) or json.dumps(record, sort_keys=True))
+            if name not in stats:
+                stats[name] = NeighbourhoodStats()
+            stats[name].add(parcel_key, record)
+    return stats
+
+
+def aggregate(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              include: Optional[Callable[[str], bool]] = None) -> Dict[str, NeighbourhoodStats]:
+    """Fold every parcel in ``path`` into per-neighbourhood stats"""
+    return aggregate_records(iter_records(path), chunk_size, include)
+
+
+def merge_stats(partials: Iterable[Dict[str, NeighbourhoodStats]]) -> Dict[str, NeighbourhoodStats]:
+    """Merge partial aggregates in the order given, neighbourhoods in sorted order"""
+    merged: Dict[str, NeighbourhoodStats] = {}
+    for partial in partials:
+        for name in sorted(partial):
+            merged.setdefault(name, NeighbourhoodStats()).merge(partial[name])
+    return merged
+
+
+def write_artifact(stats: Dict[str, NeighbourhoodStats], output: Path = AGGREGATES_PATH) -> None:
+    """Write neighbourhood summaries as one array per column, sorted by name"""
+    names = sorted(stats)
+    summaries = [stats[name].summary() for name in names]
+    columns = {"name": np.array(names, dtype=np.str_)}
+    for column in ARTIFACT_COLUMNS:
+        dtype = np.int64 if column == "parcels" else np.float32
+        columns[column] = np.array([s[column] for s in summaries], dtype=dtype)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_name(f"{output.stem}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_path, **columns)
+    os.replace(tmp_path, output)
+
+
+def read_artifact(path: Path = AGGREGATES_PATH) -> Dict[str, Dict[str, float]]:
+    """Load an aggregates artifact as {neighbourhood name: {column: value}}"""
+    with np.load(path) as artifact:
+        names = artifact["name"]
+        columns = {column: artifact[column] for column in ARTIFACT_COLUMNS if column in artifact}
+    return {
+        str(name): {column: values[i].item() for column, values in columns.items()}
+        for i, name in enumerate(names)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregate parcel exports to neighbourhood level")
+    parser.add_argument("input", type=Path, help="CSV, GeoJSON or newline-delimited GeoJSON export")
+    parser.add_argument("--output", type=Path, default=AGGREGATES_PATH)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    stats = aggregate(args.input, args.chunk_size)
+    write_artifact(stats, args.output)
+
+    parcels = sum(s.parcels for s in stats.values())
+    logger.info(
+        f"Aggregated {parcels} parcels into {len(stats)} neighbourhoods in "
+        f"{time.perf_counter() - started:.1f}s (peak RSS {peak_rss_mb():.0f} MB) -> {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Opt-in timing of the app's hot paths.
+
+Set ``GENT_INSTRUMENT=1`` to time each page render and key steps of every
+rerun (stylesheet injection, sidebar, the whole script run). Timings go into
+process-wide histograms shared by all sessions: fixed log-spaced buckets, so
+recording is a bisect and an increment under a lock, and memory does not grow
+with traffic. Percentiles are read from the buckets, accurate to one bucket
+width (about 5%).
+
+The histograms are shown on the hidden ADMIN page and periodically written
+to a Prometheus text file for node-exporter's textfile collector. Histograms
+are per process, so each server process writes its own file, named after
+``GENT_METRICS_PATH`` with its pid inserted (``metrics.<pid>.prom``), and
+labels its series with ``pid`` so the collector can merge them. The file is
+removed when the process exits. With instrumentation off, ``timed`` returns
+a shared no-op context manager.
+
+``count_deltas`` counts the delta messages a session's script runs send, for
+the debug sidebar.
+"""
+import atexit
+import bisect
+import contextlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+ENABLED = os.environ.get("GENT_INSTRUMENT") == "1"
+METRICS_PATH = Path(os.environ.get("GENT_METRICS_PATH", Path(__file__).parent / "data" / "metrics.prom"))
+# Minimum seconds between Prometheus file writes
+WRITE_INTERVAL = 15.0
+
+# Bucket upper bounds from 10 us to about 100 s, 5% apart
+BUCKET_BOUNDS: Tuple[float, ...] = tuple(1e-5 * 1.05 ** i for i in range(331))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NOOP = contextlib.nullcontext()
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket histogram of durations in seconds"""
+
+    __slots__ = ("counts", "count", "total", "_lock")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile"""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bucket, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKET_BOUNDS[min(bucket, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            **{f"p{int(q * 100)}_ms": self.quantile(q) * 1000 for q in QUANTILES},
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+_last_write = 0.0
+_write_lock = threading.Lock()
+
+
+def histogram(name: str) -> LatencyHistogram:
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, LatencyHistogram())
+    return hist
+
+
+def observe(name: str, seconds: float) -> None:
+    if ENABLED:
+        histogram(name).observe(seconds)
+
+
+@contextlib.contextmanager
+def _timed(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    yield
+    # Not recorded if the block raised, e.g. st.rerun() or st.stop() cutting a run short
+    histogram(name).observe(time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Context manager recording the duration of its block under ``name``"""
+    return _timed(name) if ENABLED else _NOOP
+
+
+def summaries() -> Dict[str, Dict[str, float]]:
+    with _histograms_lock:
+        names = sorted(_histograms)
+    return {name: _histograms[name].summary() for name in names}
+
+
+def prometheus_text() -> str:
+    """This process's histograms in the Prometheus text exposition format, as summaries"""
+    pid = os.getpid()
+    lines = [
+        "# HELP gent_step_seconds Duration of app render steps per script run",
+        "# TYPE gent_step_seconds summary",
+    ]
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    for name, hist in items:
+        for q in QUANTILES:
+            lines.append(f'gent_step_seconds{{pid="{pid}",step="{name}",quantile="{q}"}} {hist.quantile(q):.6f}')
+        lines.append(f'gent_step_seconds_sum{{pid="{pid}",step="{name}"}} {hist.total:.6f}')
+        lines.append(f'gent_step_seconds_count{{pid="{pid}",step="{name}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
+
+
+def process_metrics_path(path: Path = METRICS_PATH) -> Path:
+    """This process's metrics file: ``path`` with the pid before its suffix"""
+    return path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+
+
+def _remove_metrics_file(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def write_prometheus(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Replaced atomically so the collector never reads a partial file
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(prometheus_text(), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def maybe_write_prometheus(path: Optional[Path] = None) -> None:
+    """Write this process's Prometheus file if instrumentation is on and WRITE_INTERVAL has passed"""
+    global _last_write
+    if not ENABLED:
+        return
+    # One writer at a time per process; a session that finds it busy just skips the write
+    if not _write_lock.acquire(blocking=False):
+        return
+    try:
+        now = time.monotonic()
+        if now - _last_write < WRITE_INTERVAL:
+            return
+        path = path or process_metrics_path()
+        if not _last_write:
+            atexit.register(_remove_metrics_file, path)
+        _last_write = now
+        write_prometheus(path)
+    finally:
+        _write_lock.release()
+
+
+def count_deltas(on_delta: Callable[[bool], None]) -> bool:
+    """Call ``on_delta(in_fragment)`` for every delta message this session's script runs send
+
+    Streamlit has no public hook on outgoing messages, so this wraps the private
+    ``ScriptRunContext._enqueue``, once per session. If a Streamlit release
+    drops it, nothing is wrapped and this returns False; the instrumentation
+    tests fail when that happens.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return False
+    hooked = getattr(ctx, "counts_deltas", None)
+    if hooked is not None:
+        return hooked
+    enqueue = getattr(ctx, "_enqueue", None)
+    hooked = callable(enqueue)
+    if hooked:
+        def counting_enqueue(msg):
+            if msg.WhichOneof("type") == "delta":
+                # Set only while a fragment reruns on its own
+                on_delta(bool(getattr(ctx, "fragment_ids_this_run", None)))
+            enqueue(msg)
+
+        ctx._enqueue = counting_enqueue
+    ctx.counts_deltas = hooked
+    return hooked
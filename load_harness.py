@@ -0,0 +1,185 @@
+"""Concurrent-session load harness for capacity planning.
+
+Simulates many students using the app at once. Each session is its own
+process running an AppTest instance that loops through the user journeys from
+``bench_app.py`` for a fixed duration, starting a fresh session for each
+journey. All sessions at a level start together and every script run is timed.
+AppTest patches process-wide Streamlit state while a script runs, so sessions
+cannot share a process; a level therefore measures how many concurrent
+script runs the host's cores sustain, and RSS is reported per session process
+rather than for one shared server.
+
+For each session count the harness reports throughput (script runs per
+second), p50/p99 run latency and the RSS growth of the worker processes.
+The knee is the first session count where adding sessions stops paying off:
+throughput grows by less than ``--min-gain`` over the previous level, or p99
+latency exceeds ``--p99-budget-ms``. The level before it is the suggested
+per-host capacity.
+
+Usage:
+    python load_harness.py --sessions 1,2,4,8,16 --duration 20
+    python load_harness.py --sessions 8,16,32 -o load.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from resource_usage import peak_rss_mb
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_LEVELS = "1,2,4,8"
+DEFAULT_DURATION = 15.0
+DEFAULT_P99_BUDGET_MS = 1000.0
+DEFAULT_MIN_GAIN = 0.1
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process, or its peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_session(duration: float, seed: int, start_barrier) -> Dict:
+    """One simulated student: loop through randomly chosen journeys until the duration is up"""
+    logging.disable(logging.CRITICAL)
+    from bench_app import JOURNEYS, new_app
+
+    # Import and warm the app before measuring, as a running server would be;
+    # new_app() first moves its ledger and event trail to a temp dir
+    new_app().run()
+    rss_before = current_rss_mb()
+    start_barrier.wait()
+
+    rng = random.Random(seed)
+    names = list(JOURNEYS)
+    latencies: List[float] = []
+    errors: List[str] = []
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        at = new_app()
+        run = at._run
+
+        def timed_run(*args, **kwargs):
+            run_started = time.perf_counter()
+            try:
+                return run(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - run_started)
+
+        # Element interactions call AppTest._run, so this times every script run
+        at._run = timed_run
+        try:
+            at.run()
+            JOURNEYS[rng.choice(names)](at)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "elapsed": time.perf_counter() - started,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": current_rss_mb(),
+    }
+
+
+def run_level(sessions: int, duration: float) -> Dict:
+    """Run ``sessions`` concurrent session processes and merge their measurements"""
+    with Manager() as manager, ProcessPoolExecutor(max_workers=sessions) as pool:
+        start_barrier = manager.Barrier(sessions)
+        results = list(pool.map(run_session, [duration] * sessions, range(sessions), [start_barrier] * sessions))
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    elapsed = max(r["elapsed"] for r in results)
+    errors = [e for r in results for e in r["errors"]]
+    rss_growth = [r["rss_after_mb"] - r["rss_before_mb"] for r in results]
+    return {
+        "sessions": sessions,
+        "runs": len(latencies),
+        "errors": len(errors),
+        "sample_errors": errors[:5],
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "rss_mb_per_session": round(max(r["rss_after_mb"] for r in results), 1),
+        "rss_growth_mb_per_session": round(max(rss_growth), 1),
+        "rss_total_mb": round(sum(r["rss_after_mb"] for r in results), 1),
+    }
+
+
+def find_knee(levels: List[Dict], p99_budget_ms: float, min_gain: float) -> Dict:
+    """First level where throughput stops scaling or p99 goes over budget"""
+    for previous, level in zip([None] + levels, levels):
+        if level["p99_ms"] > p99_budget_ms:
+            reason = f"p99 {level['p99_ms']:.0f} ms over the {p99_budget_ms:.0f} ms budget"
+        elif previous and level["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            reason = (f"throughput {previous['throughput_rps']:.1f} -> {level['throughput_rps']:.1f} runs/s, "
+                      f"under {min_gain:.0%} gain")
+        else:
+            continue
+        return {
+            "knee_sessions": level["sessions"],
+            "capacity_sessions": previous["sessions"] if previous else 0,
+            "reason": reason,
+        }
+    return {
+        "knee_sessions": None,
+        "capacity_sessions": levels[-1]["sessions"] if levels else 0,
+        "reason": "no knee within the tested levels",
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure per-host capacity with simulated concurrent sessions")
+    parser.add_argument("--sessions", default=DEFAULT_SESSION_LEVELS,
+                        help="Comma-separated concurrent session counts to test, ascending")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds to run each level")
+    parser.add_argument("--p99-budget-ms", type=float, default=DEFAULT_P99_BUDGET_MS)
+    parser.add_argument("--min-gain", type=float, default=DEFAULT_MIN_GAIN,
+                        help="Smallest throughput gain per level that still counts as scaling")
+    parser.add_argument("-o", "--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    logger.setLevel(logging.INFO)
+
+    levels = []
+    for sessions in sorted({int(n) for n in args.sessions.split(",")}):
+        level = run_level(sessions, args.duration)
+        levels.append(level)
+        logger.info(
+            f"{sessions:>4} sessions: {level['throughput_rps']:8.1f} runs/s  p50 {level['p50_ms']:7.1f} ms  "
+            f"p99 {level['p99_ms']:7.1f} ms  RSS {level['rss_mb_per_session']:.0f} MB/session "
+            f"(+{level['rss_growth_mb_per_session']:.0f} MB, {level['rss_total_mb']:.0f} MB total)  "
+            f"errors {level['errors']}"
+        )
+
+    knee = find_knee(levels, args.p99_budget_ms, args.min_gain)
+    logger.info(f"Knee at {knee['knee_sessions']} sessions ({knee['reason']}); "
+                f"capacity about {knee['capacity_sessions']} concurrent sessions on this host")
+
+    if args.output:
+        args.output.write_text(json.dumps({"levels": levels, "knee": knee}, indent=2) + "\n", encoding="utf-8")
+    return 1 if any(level["errors"] for level in levels) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""File-backed location store for the Check Your Area page.
+
+Locations are seeded from ``data/locations.json`` into a SQLite database with
+indexes on name, ward and risk tier. When an aggregates artifact produced by
+``ingest.py`` is present, its neighbourhood indicators override the seed
+values. Risk tiers are computed from the indicators by ``risk_scoring`` when
+the database is built. The database is rebuilt only when the seed, the
+aggregates or the scoring model change, so opening the store is cheap and can
+be shared per process.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import risk_scoring
+from ingest import AGGREGATES_PATH, normalize_name, read_artifact
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+SEED_PATH = DATA_DIR / "locations.json"
+DB_PATH = DATA_DIR / "locations.db"
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    ward TEXT NOT NULL,
+    risk TEXT NOT NULL,
+    risk_score REAL NOT NULL,
+    rent_growth REAL,
+    value_change REAL,
+    low_income_share REAL,
+    coop_share REAL,
+    lon REAL NOT NULL,
+    lat REAL NOT NULL,
+    boundary TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE INDEX idx_locations_ward ON locations (ward, name);
+CREATE INDEX idx_locations_risk ON locations (risk, name);
+"""
+
+
+@dataclass(frozen=True)
+class Location:
+    name: str
+    ward: str
+    risk: str
+    risk_score: float
+    lon: float
+    lat: float
+    description: str
+
+
+def _seed_version(seed_path: Path, aggregates_path: Path) -> str:
+    """Content hash of the seed, aggregates and scoring model, used to detect stale databases"""
+    digest = hashlib.sha1(seed_path.read_bytes())
+    if aggregates_path.exists():
+        digest.update(aggregates_path.read_bytes())
+    digest.update(risk_scoring.MODEL_VERSION.encode())
+    return digest.hexdigest()[:12]
+
+
+def _db_version(db_path: Path) -> Optional[str]:
+    if not db_path.exists():
+        return None
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+def _merged_indicators(records: List[dict], aggregates_path: Path) -> List[Dict[str, float]]:
+    """Seed indicators, overridden by ingested neighbourhood aggregates where available"""
+    indicators = [dict(r["indicators"]) for r in records]
+    if not aggregates_path.exists():
+        return indicators
+
+    aggregates = read_artifact(aggregates_path)
+    matched = 0
+    for record, values in zip(records, indicators):
+        aggregate = aggregates.get(normalize_name(record["name"]))
+        if aggregate is None:
+            continue
+        matched += 1
+        for name in risk_scoring.INDICATORS:
+            value = aggregate.get(name)
+            if value is not None and not np.isnan(value):
+                values[name] = value
+    logger.info(f"Applied ingested aggregates to {matched} of {len(records)} locations")
+    return indicators
+
+
+def build_database(seed_path: Path = SEED_PATH, db_path: Path = DB_PATH,
+                   aggregates_path: Path = AGGREGATES_PATH) -> str:
+    """Build the SQLite database from the JSON seed file and return its version"""
+    version = _seed_version(seed_path, aggregates_path)
+    with open(seed_path, encoding="utf-8") as f:
+        records = json.load(f)["locations"]
+
+    matrix = risk_scoring.indicator_matrix(_merged_indicators(records, aggregates_path))
+    scored = risk_scoring.score_dataset(matrix)
+    tiers = scored.tier_names()
+
+    # Build next to the target and swap in atomically so concurrent
+    # processes never observe a half-written database
+    tmp_path = db_path.with_suffix(f".{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO locations (name, ward, risk, risk_score, rent_growth, value_change, "
+            "low_income_share, coop_share, lon, lat, boundary, description) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((r["name"], r["ward"], tier, float(score), *(None if np.isnan(v) else float(v) for v in row),
+              r["centroid"][0], r["centroid"][1], json.dumps(r["boundary"]), r["description"])
+             for r, tier, score, row in zip(records, tiers, scored.scores, matrix)),
+        )
+        conn.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (version,))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+    logger.info(f"Built location database {db_path} ({len(records)} locations, version {version})")
+    return version
+
+
+class LocationStore:
+    """Read-only, thread-safe view over the location database"""
+
+    def __init__(self, db_path: Path, version: str):
+        self.db_path = db_path
+        self.version = version
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, db_path: Path = DB_PATH, seed_path: Path = SEED_PATH,
+             aggregates_path: Path = AGGREGATES_PATH) -> "LocationStore":
+        """Open the store, rebuilding the database first if its inputs have changed"""
+        version = _db_version(db_path)
+        if version is None or (seed_path.exists() and version != _seed_version(seed_path, aggregates_path)):
+            version = build_database(seed_path, db_path, aggregates_path)
+        return cls(db_path, version)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(ward: Optional[str], risk: Optional[str], name_prefix: Optional[str]) -> Tuple[str, Tuple]:
+        clauses, params = [], []
+        if ward:
+            clauses.append("ward = ?")
+            params.append(ward)
+        if risk:
+            clauses.append("risk = ?")
+            params.append(risk)
+        if name_prefix:
+            # Escape LIKE wildcards so user input is treated literally
+            escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"{escaped}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, tuple(params)
+
+    def count(self, ward: Optional[str] = None, risk: Optional[str] = None,
+              name_prefix: Optional[str] = None) -> int:
+        where, params = self._where(ward, risk, name_prefix)
+        return self._query(f"SELECT COUNT(*) FROM locations {where}", params)[0][0]
+
+    def page(self, offset: int = 0, limit: int = 10, ward: Optional[str] = None,
+             risk: Optional[str] = None, name_prefix: Optional[str] = None) -> List[Location]:
+        """Return one page of locations ordered by name"""
+        where, params = self._where(ward, risk, name_prefix)
+        rows = self._query(
+            f"SELECT name, ward, risk, risk_score, lon, lat, description FROM locations {where} "
+            f"ORDER BY name LIMIT ? OFFSET ?",
+            params + (limit, offset),
+        )
+        return [Location(*row) for row in rows]
+
+    def get(self, name: str) -> Optional[Location]:
+        rows = self._query(
+            "SELECT name, ward, risk, risk_score, lon, lat, description FROM locations WHERE name = ?", (name,)
+        )
+        return Location(*rows[0]) if rows else None
+
+    def geometries(self) -> List[Tuple[str, float, float, List[List[float]]]]:
+        """Return (name, lon, lat, boundary ring) for every location"""
+        rows = self._query("SELECT name, lon, lat, boundary FROM locations ORDER BY id")
+        return [(name, lon, lat, json.loads(boundary)) for name, lon, lat, boundary in rows]
+
+    def risk_rows(self) -> List[tuple]:
+        """Return (name, ward, risk, risk_score, lon, lat, *indicators) for every location"""
+        columns = ", ".join(risk_scoring.INDICATORS)
+        return self._query(
+            f"SELECT name, ward, risk, risk_score, lon, lat, {columns} FROM locations ORDER BY name"
+        )
+
+    def wards(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT DISTINCT ward FROM locations ORDER BY ward")]
+
+    def risk_tiers(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT DISTINCT risk FROM locations ORDER BY risk")]
@@ -0,0 +1,195 @@
+"""Local stand-in payment processor for testing donations offline.
+
+A small asyncio HTTP/1.1 server with keep-alive, speaking the API that
+``payments.PaymentClient`` expects:
+
+- ``POST /v1/charges`` with an ``Idempotency-Key`` header and a JSON body
+  ``{"amount_cents": ...}`` creates a pending charge and returns it. Repeating
+  the key returns the existing charge instead of charging twice.
+- ``GET /v1/charges/<id>`` returns a charge; it settles (or is declined)
+  ``--settle-seconds`` after it was created.
+
+Failures can be injected to exercise the client: ``--error-rate`` answers that
+share of requests with 503, ``--latency`` delays every response and
+``--decline-rate`` declines that share of charges. Charges live in memory.
+
+Usage:
+    python mock_processor.py --port 8765
+    python mock_processor.py --error-rate 0.3 --latency 0.5 --decline-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SETTLE_SECONDS = 1.0
+# Keep-alive connections idle for longer than this are closed
+IDLE_TIMEOUT = 30.0
+MAX_BODY_BYTES = 64 << 10
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+@dataclass
+class Charge:
+    id: str
+    amount_cents: int
+    status: str
+    created_at: float
+    settles_at: float
+    declines: bool
+
+
+class MockProcessor:
+    """In-memory charges served over HTTP/1.1 with keep-alive"""
+
+    def __init__(self, settle_seconds: float = DEFAULT_SETTLE_SECONDS, error_rate: float = 0.0,
+                 latency: float = 0.0, decline_rate: float = 0.0, seed: Optional[int] = None):
+        self.settle_seconds = settle_seconds
+        self.error_rate = error_rate
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.charges: Dict[str, Charge] = {}
+        self.by_key: Dict[str, str] = {}
+        self.requests = 0
+        self.connections = 0
+        self._rng = random.Random(seed)
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"Mock processor listening on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        return server
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    # Idle, disconnected or malformed: drop the connection
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._respond(method, path, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body of {length} bytes is too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _respond(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, dict]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            return 503, {"error": "injected failure"}
+
+        parts = path.strip("/").split("/")
+        if parts[:2] != ["v1", "charges"] or len(parts) > 3:
+            return 404, {"error": f"no route for {path}"}
+        if len(parts) == 3:
+            if method != "GET":
+                return 405, {"error": "use GET for a charge"}
+            charge = self.charges.get(parts[2])
+            return (200, self._view(charge)) if charge else (404, {"error": "no such charge"})
+        if method != "POST":
+            return 405, {"error": "use POST to create a charge"}
+        return self._create(headers.get("idempotency-key", ""), body)
+
+    def _create(self, key: str, body: bytes) -> Tuple[int, dict]:
+        if not key:
+            return 400, {"error": "Idempotency-Key header is required"}
+        if key in self.by_key:
+            return 200, self._view(self.charges[self.by_key[key]])
+        try:
+            amount_cents = int(json.loads(body)["amount_cents"])
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "body must be JSON with an integer amount_cents"}
+        if amount_cents <= 0:
+            return 400, {"error": "amount_cents must be positive"}
+        now = time.monotonic()
+        charge = Charge(
+            id=f"ch_{uuid.uuid4().hex[:16]}",
+            amount_cents=amount_cents,
+            status="pending",
+            created_at=now,
+            settles_at=now + self.settle_seconds,
+            declines=self._rng.random() < self.decline_rate,
+        )
+        self.charges[charge.id] = charge
+        self.by_key[key] = charge.id
+        return 201, self._view(charge)
+
+    def _view(self, charge: Charge) -> dict:
+        if charge.status == "pending" and time.monotonic() >= charge.settles_at:
+            charge.status = "declined" if charge.declines else "settled"
+        return {key: value for key, value in asdict(charge).items() if key in ("id", "amount_cents", "status")}
+
+
+async def run(args: argparse.Namespace) -> None:
+    processor = MockProcessor(args.settle_seconds, args.error_rate, args.latency, args.decline_rate, args.seed)
+    server = await processor.serve(args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a local stand-in payment processor")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Seconds a charge stays pending before it settles")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--decline-rate", type=float, default=0.0, help="Share of charges declined")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
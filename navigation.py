@@ -0,0 +1,26 @@
+"""Sidebar navigation registry for the app.
+
+Streamlit re-executes ``gent.py`` on every rerun, so the registry lives in its
+own module: it is built once, when the module is first imported, and every
+rerun and session reads the same tuple.
+"""
+from typing import NamedTuple
+
+
+class NavItem(NamedTuple):
+    label: str
+    key: str
+    page: str
+    tooltip: str
+
+
+# Sidebar navigation, in display order
+NAV_ITEMS = (
+    NavItem("🏠 Home", "home_nav", "HOME", "Return to the main page"),
+    NavItem("📚 Learn", "learn_nav", "LEARN", "Start learning about gentrification"),
+    NavItem("🎮 Play", "play_nav", "PLAY", "Test your knowledge with scenarios"),
+    NavItem("💰 Donate", "donate_nav", "DONATE", "Support affordable housing initiatives"),
+    NavItem("🔍 Check Your Area", "check_nav", "CHECK", "Check gentrification risk in your area"),
+    NavItem("📋 Sources", "source_nav", "SOURCE", "View sources and references"),
+    NavItem("❌ Close App", "close_nav", "CLOSE", "Exit the application"),
+)
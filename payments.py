@@ -0,0 +1,421 @@
+"""Asynchronous payment client for donations.
+
+Charging a donation must not block a session's rerun, so all processor I/O
+happens on one background thread running an asyncio event loop. The script
+thread calls ``PaymentService.start_charge``, which schedules the charge with
+``run_coroutine_threadsafe`` and returns at once; the page then polls
+``PaymentService.status`` for the charge to move from pending to settled.
+
+A settled charge is only reported settled once the donation is recorded. If
+recording fails or times out, the charge is reported as charged (the money is
+taken, the ledger write is still being retried) rather than failed.
+
+``PaymentClient`` talks HTTP/1.1 (or HTTPS) over a small pool of keep-alive
+connections (asyncio streams), reading bodies framed by Content-Length, by
+chunked transfer encoding or by the connection closing. A connection goes back
+to the pool only after its response was read to the end. Every attempt has a
+timeout, and it retries with
+exponential backoff and full jitter on timeouts, connection errors, 429 and
+5xx. The donation's idempotency key is sent with every charge, so a retried
+or repeated request never charges twice.
+
+Payments are off unless ``GENT_PAYMENTS_URL`` is set, e.g. to the local stand-in
+processor in ``mock_processor.py``.
+"""
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import os
+import random
+import ssl
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+PAYMENTS_URL = os.environ.get("GENT_PAYMENTS_URL", "")
+ENABLED = bool(PAYMENTS_URL)
+
+MAX_CONNECTIONS = 8
+CONNECT_TIMEOUT = 3.0
+# Per attempt, from sending the request to reading the whole response
+REQUEST_TIMEOUT = 5.0
+# Larger responses are treated as an error rather than read into memory
+MAX_RESPONSE_BYTES = 1 << 20
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+# How often a pending charge is re-checked with the processor, and for how long
+SETTLE_POLL_INTERVAL = 0.5
+SETTLE_TIMEOUT = 60.0
+# Recording a settled charge: time allowed per attempt, and attempts before giving up
+RECORD_TIMEOUT = 10.0
+RECORD_ATTEMPTS = 8
+RECORD_BACKOFF_CAP = 60.0
+# Finished charges are forgotten this long after their last update
+STATUS_TTL = 15 * 60.0
+
+PENDING = "pending"
+# Settled with the processor, but not yet recorded
+CHARGED = "charged"
+SETTLED = "settled"
+FAILED = "failed"
+# States a charge can still leave by itself
+IN_FLIGHT = (PENDING, CHARGED)
+
+
+class PaymentError(Exception):
+    """The processor rejected a request, or it could not be reached after all retries"""
+
+
+class _StaleConnection(Exception):
+    """A pooled keep-alive connection was closed by the server while idle"""
+
+
+@dataclass(frozen=True)
+class PaymentStatus:
+    state: str
+    charge_id: str = ""
+    detail: str = ""
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "reused", "keep_alive")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+        self.keep_alive = False
+
+
+class ConnectionPool:
+    """Keep-alive connections to one host, at most ``max_connections`` in use at once"""
+
+    def __init__(self, host: str, port: int, max_connections: int = MAX_CONNECTIONS,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.opened = 0
+        self._idle: List[_Connection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[_Connection]:
+        async with self._slots:
+            if self._idle:
+                conn = self._idle.pop()
+                conn.reused = True
+            else:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, ssl=self.ssl_context), CONNECT_TIMEOUT)
+                self.opened += 1
+                conn = _Connection(reader, writer)
+            # Only returned to the pool if the response was read to the end and the server kept it open
+            conn.keep_alive = False
+            try:
+                yield conn
+            finally:
+                if conn.keep_alive and not conn.writer.is_closing():
+                    self._idle.append(conn)
+                else:
+                    conn.writer.close()
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop().writer.close()
+
+
+class PaymentClient:
+    """Processor API client; must be used from a single event loop"""
+
+    def __init__(self, base_url: str = PAYMENTS_URL, max_connections: int = MAX_CONNECTIONS,
+                 max_attempts: int = MAX_ATTEMPTS, ssl_context: Optional[ssl.SSLContext] = None):
+        """``ssl_context`` overrides the default certificate checks for https, e.g. to trust a private CA"""
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported payments URL: {base_url!r}")
+        if parts.scheme == "https":
+            ssl_context = ssl_context or ssl.create_default_context()
+        else:
+            ssl_context = None
+        self.host = parts.hostname
+        self.port = parts.port or (443 if ssl_context else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.max_attempts = max_attempts
+        self.pool = ConnectionPool(self.host, self.port, max_connections, ssl_context)
+
+    async def create_charge(self, idempotency_key: str, amount_cents: int) -> Dict:
+        return await self.request("POST", "/v1/charges", {"amount_cents": amount_cents},
+                                  idempotency_key=idempotency_key)
+
+    async def get_charge(self, charge_id: str) -> Dict:
+        return await self.request("GET", f"/v1/charges/{charge_id}")
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None,
+                      idempotency_key: str = "") -> Dict:
+        """Send a request, retrying transient failures with jittered exponential backoff"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                status, payload = await asyncio.wait_for(
+                    self._send(method, path, body, idempotency_key), REQUEST_TIMEOUT)
+            except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if status < 400:
+                    return payload
+                error = f"HTTP {status}: {payload.get('error', '')}"
+                if status != 429 and status < 500:
+                    raise PaymentError(f"{method} {path} failed: {error}")
+            if attempt < self.max_attempts:
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"{method} {path} attempt {attempt} failed ({error}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        raise PaymentError(f"{method} {path} failed after {self.max_attempts} attempts: {error}")
+
+    async def _send(self, method: str, path: str, body: Optional[Dict],
+                    idempotency_key: str) -> Tuple[int, Dict]:
+        data = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n")
+        if idempotency_key:
+            head += f"Idempotency-Key: {idempotency_key}\r\n"
+        request = (head + "\r\n").encode() + data
+        # A pooled connection the server has since closed fails before any response;
+        # move on to the next one (or a new connection) without using up an attempt
+        while True:
+            async with self.pool.connection() as conn:
+                try:
+                    return await self._exchange(conn, request)
+                except _StaleConnection:
+                    continue
+
+    async def _exchange(self, conn: _Connection, request: bytes) -> Tuple[int, Dict]:
+        try:
+            conn.writer.write(request)
+            await conn.writer.drain()
+            status_line = await conn.reader.readline()
+        except ConnectionError:
+            if conn.reused:
+                raise _StaleConnection()
+            raise
+        if not status_line:
+            if conn.reused:
+                raise _StaleConnection()
+            raise ConnectionResetError("Connection closed before a response")
+        while True:
+            version, status = status_line.split()[:2]
+            status = int(status)
+            headers = await self._read_headers(conn.reader)
+            if not 100 <= status < 200:
+                break
+            # Interim response, e.g. 100 Continue; the final one follows
+            status_line = await conn.reader.readline()
+        if status in (204, 304):
+            payload, complete = b"", True
+        else:
+            payload, complete = await self._read_body(conn.reader, headers)
+        # HTTP/1.0 closes unless asked not to; HTTP/1.1 keeps the connection unless told otherwise
+        persistent = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        conn.keep_alive = complete and persistent
+        return status, json.loads(payload) if payload else {}
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+        """Read a response body; returns it and whether the connection can carry another request"""
+        encodings = [coding.strip().lower() for coding in headers.get("transfer-encoding", "").split(",")]
+        if encodings[-1] == "chunked":
+            chunks = []
+            size = 0
+            while True:
+                chunk_size = int((await reader.readline()).split(b";")[0], 16)
+                if chunk_size == 0:
+                    break
+                size += chunk_size
+                if size > MAX_RESPONSE_BYTES:
+                    raise ValueError(f"Response body over {MAX_RESPONSE_BYTES} bytes")
+                chunks.append(await reader.readexactly(chunk_size))
+                await reader.readexactly(2)
+            # Trailers, up to the blank line that ends the message
+            await self._read_headers(reader)
+            return b"".join(chunks), True
+        if encodings != [""]:
+            # Some other transfer coding: the body ends when the server closes the connection
+            return await self._read_to_close(reader), False
+        if "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > MAX_RESPONSE_BYTES:
+                raise ValueError(f"Response body of {length} bytes is too large")
+            return await reader.readexactly(length), True
+        return await self._read_to_close(reader), False
+
+    async def _read_to_close(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > MAX_RESPONSE_BYTES:
+                raise ValueError(f"Response body over {MAX_RESPONSE_BYTES} bytes")
+            chunks.append(chunk)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class PaymentService:
+    """Runs charges on a background event loop and tracks their status by idempotency key"""
+
+    def __init__(self, base_url: str = PAYMENTS_URL):
+        self.base_url = base_url
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="payments", daemon=True)
+        self._thread.start()
+        self._client: PaymentClient = self._call(self._make_client()).result()
+        self._statuses: Dict[str, PaymentStatus] = {}
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + STATUS_TTL
+
+    async def _make_client(self) -> PaymentClient:
+        # Created on the loop's thread, so the pool's semaphore belongs to that loop
+        return PaymentClient(self.base_url)
+
+    def _call(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def start_charge(self, idempotency_key: str, amount_cents: int,
+                     on_settled: Optional[Callable[[], Future]] = None) -> PaymentStatus:
+        """Start charging in the background unless this key is already pending or settled
+
+        ``on_settled`` is called on the loop's thread once the charge settles, and
+        the charge is only reported settled when the future it returns is done, so
+        a settled charge is recorded even if the session that started it has gone.
+        Until then it is reported as CHARGED, and ``on_settled`` is retried.
+        """
+        with self._lock:
+            self._prune()
+            current = self._statuses.get(idempotency_key)
+            if current and current.state != FAILED:
+                return current
+            current = self._statuses[idempotency_key] = PaymentStatus(PENDING)
+        self._call(self._charge(idempotency_key, amount_cents, on_settled))
+        return current
+
+    def status(self, idempotency_key: str) -> Optional[PaymentStatus]:
+        """Latest known status of a charge; never waits on the processor"""
+        return self._statuses.get(idempotency_key)
+
+    def _set(self, idempotency_key: str, status: PaymentStatus) -> None:
+        with self._lock:
+            self._statuses[idempotency_key] = status
+            self._prune()
+
+    def _prune(self) -> None:
+        """Drop finished charges not updated for STATUS_TTL; call with the lock held"""
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + STATUS_TTL / 4
+        cutoff = now - STATUS_TTL
+        for key in [key for key, status in self._statuses.items()
+                    if status.state not in IN_FLIGHT and status.updated_at < cutoff]:
+            del self._statuses[key]
+
+    async def _charge(self, idempotency_key: str, amount_cents: int,
+                      on_settled: Optional[Callable[[], Future]]) -> None:
+        try:
+            charge = await self._client.create_charge(idempotency_key, amount_cents)
+            self._set(idempotency_key, PaymentStatus(PENDING, charge["id"]))
+            deadline = time.monotonic() + SETTLE_TIMEOUT
+            while charge["status"] == PENDING:
+                if time.monotonic() > deadline:
+                    raise PaymentError(f"Charge {charge['id']} still pending after {SETTLE_TIMEOUT:.0f}s")
+                await asyncio.sleep(SETTLE_POLL_INTERVAL)
+                charge = await self._client.get_charge(charge["id"])
+        except Exception as e:
+            logger.error(f"Charge {idempotency_key} failed: {e}")
+            self._set(idempotency_key, PaymentStatus(FAILED, detail=str(e)))
+            return
+        if charge["status"] != SETTLED:
+            self._set(idempotency_key, PaymentStatus(FAILED, charge["id"], f"Charge {charge['status']}"))
+        elif on_settled is None:
+            self._set(idempotency_key, PaymentStatus(SETTLED, charge["id"]))
+        else:
+            await self._record(idempotency_key, charge["id"], on_settled)
+
+    async def _record(self, idempotency_key: str, charge_id: str, on_settled: Callable[[], Future]) -> None:
+        """Run ``on_settled`` for a settled charge, retrying with backoff until it succeeds"""
+        for attempt in range(1, RECORD_ATTEMPTS + 1):
+            try:
+                await asyncio.wait_for(asyncio.wrap_future(on_settled()), RECORD_TIMEOUT)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self._set(idempotency_key, PaymentStatus(CHARGED, charge_id, f"Not recorded yet ({error})"))
+            else:
+                self._set(idempotency_key, PaymentStatus(SETTLED, charge_id))
+                return
+            if attempt < RECORD_ATTEMPTS:
+                delay = random.uniform(0, min(RECORD_BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                logger.error(f"Charge {charge_id} ({idempotency_key}) settled but recording failed "
+                             f"({error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        # Stays CHARGED: the money was taken, so this needs reconciling by hand
+        logger.critical(f"Charge {charge_id} ({idempotency_key}) settled but could not be recorded after "
+                        f"{RECORD_ATTEMPTS} attempts ({error}); reconcile it with the processor")
+
+    async def _shutdown(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._client.close()
+        # Let the closed connections' transports finish closing
+        await asyncio.sleep(0)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Cancel charges in flight, close pooled connections and stop the event loop"""
+        if not self._thread.is_alive():
+            return
+        in_flight = [key for key, status in self._statuses.items() if status.state in IN_FLIGHT]
+        if in_flight:
+            logger.warning(f"Stopping with {len(in_flight)} charges in flight: {', '.join(in_flight)}")
+        try:
+            self._call(self._shutdown()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._loop.close()
+
+
+_service: Optional[PaymentService] = None
+_service_lock = threading.Lock()
+
+
+def get_payments() -> PaymentService:
+    """The process-wide payment service, started on first use and stopped at exit"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PaymentService()
+                atexit.register(_service.close)
+    return _service
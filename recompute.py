@@ -0,0 +1,165 @@
+"""Multi-core recomputation of neighbourhood risk aggregates.
+
+The input export is split into line-aligned byte ranges, one per shard, and
+each worker process aggregates the parcels in its range with the same code
+used by ``ingest.py``. Sharding the input rather than the neighbourhood list
+means every row is parsed exactly once; the partial per-neighbourhood
+aggregates are then merged in shard order, which keeps the result identical
+for a given input regardless of worker scheduling.
+
+CSV and newline-delimited GeoJSON inputs are sharded. Byte ranges assume no
+line breaks inside quoted CSV fields. GeoJSON FeatureCollections cannot be
+split on line boundaries and are processed as a single shard.
+
+Usage:
+    python recompute.py assessments.csv --workers 8
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ingest import (
+    AGGREGATES_PATH, DEFAULT_CHUNK_SIZE, NeighbourhoodStats, Record, aggregate_records,
+    iter_records, merge_stats, peak_rss_mb, write_artifact,
+)
+
+logger = logging.getLogger(__name__)
+
+# Don't split inputs into shards smaller than this
+MIN_SHARD_BYTES = 4 << 20
+
+ByteRange = Tuple[int, int]
+
+
+@dataclass
+class ShardResult:
+    index: int
+    byte_range: ByteRange
+    parcels: int
+    seconds: float
+    stats: Dict[str, NeighbourhoodStats]
+
+
+def _is_line_delimited(path: Path) -> bool:
+    suffix = path.suffix.lower()
+    if suffix == ".csv" or suffix in (".geojsonl", ".ndjson"):
+        return True
+    if suffix in (".geojson", ".json"):
+        with open(path, encoding="utf-8") as f:
+            first_line = f.readline()
+        return '"Feature"' in first_line and '"FeatureCollection"' not in first_line
+    return False
+
+
+def plan_shards(path: Path, shards: int) -> List[ByteRange]:
+    """Split the data portion of ``path`` into up to ``shards`` byte ranges"""
+    size = path.stat().st_size
+    data_start = 0
+    if path.suffix.lower() == ".csv":
+        with open(path, "rb") as f:
+            f.readline()
+            data_start = f.tell()
+
+    data_size = size - data_start
+    if data_size <= 0:
+        return [(data_start, size)]
+    shards = max(1, min(shards, data_size // MIN_SHARD_BYTES or 1))
+    step = -(-data_size // shards)
+    return [(start, min(start + step, size)) for start in range(data_start, size, step)]
+
+
+def _iter_lines(path: Path, byte_range: ByteRange) -> Iterator[str]:
+    """Yield the lines that start inside ``byte_range``"""
+    start, end = byte_range
+    with open(path, "rb") as f:
+        if start > 0:
+            # Finish the line that straddles the boundary; it belongs to the previous shard
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode("utf-8")
+
+
+def _iter_range_records(path: Path, byte_range: ByteRange) -> Iterator[Record]:
+    lines = _iter_lines(path, byte_range)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+        yield from csv.DictReader(lines, fieldnames=header)
+    else:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line).get("properties") or {}
+
+
+def _run_shard(path: Path, index: int, byte_range: Optional[ByteRange], chunk_size: int) -> ShardResult:
+    started = time.perf_counter()
+    records = iter_records(path) if byte_range is None else _iter_range_records(path, byte_range)
+    stats = aggregate_records(records, chunk_size)
+    return ShardResult(
+        index=index,
+        byte_range=byte_range or (0, path.stat().st_size),
+        parcels=sum(s.parcels for s in stats.values()),
+        seconds=time.perf_counter() - started,
+        stats=stats,
+    )
+
+
+def recompute(path: Path, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[Dict[str, NeighbourhoodStats], List[ShardResult]]:
+    """Aggregate ``path`` across a process pool and merge the shards deterministically"""
+    if _is_line_delimited(path):
+        ranges: List[Optional[ByteRange]] = list(plan_shards(path, workers))
+    else:
+        logger.warning(f"{path.name} is not line-delimited; processing it as a single shard")
+        ranges = [None]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [
+            pool.submit(_run_shard, path, index, byte_range, chunk_size)
+            for index, byte_range in enumerate(ranges)
+        ]
+        results = [future.result() for future in futures]
+
+    results.sort(key=lambda result: result.index)
+    return merge_stats(result.stats for result in results), results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute neighbourhood aggregates across CPU cores")
+    parser.add_argument("input", type=Path, help="CSV or newline-delimited GeoJSON export")
+    parser.add_argument("--output", type=Path, default=AGGREGATES_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    stats, shards = recompute(args.input, args.workers, args.chunk_size)
+    write_artifact(stats, args.output)
+
+    for shard in shards:
+        start, end = shard.byte_range
+        logger.info(
+            f"Shard {shard.index}: bytes {start}-{end}, {shard.parcels} parcels in {shard.seconds:.2f}s"
+        )
+    parcels = sum(s.parcels for s in stats.values())
+    logger.info(
+        f"Recomputed {len(stats)} neighbourhoods from {parcels} parcels with {len(shards)} shards in "
+        f"{time.perf_counter() - started:.1f}s (parent peak RSS {peak_rss_mb():.0f} MB) -> {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""Resource usage of the current process, for the command-line tools' reports."""
+import resource
+import sys
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
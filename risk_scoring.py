@@ -0,0 +1,72 @@
+"""Vectorized gentrification risk scoring.
+
+Each location is described by four numeric indicators. Indicators are scaled
+against fixed reference ranges (so a location's score does not depend on which
+other locations are loaded), combined with a weighted sum, and bucketed into
+the risk tiers shown on the Check page. All steps operate on whole NumPy
+arrays, so scoring tens of thousands of parcels is a handful of array ops.
+"""
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+
+# Bump when weights, ranges or thresholds change so stored scores are rebuilt
+MODEL_VERSION = "1"
+
+INDICATORS = ("rent_growth", "value_change", "low_income_share", "coop_share")
+
+# (low, high) reference range per indicator, in INDICATORS order:
+# annual rent growth %, annual property value change %, share of low-income
+# households, share of co-op housing
+REFERENCE_RANGES = np.array([
+    (0.0, 10.0),
+    (0.0, 15.0),
+    (0.0, 0.5),
+    (0.0, 0.25),
+])
+WEIGHTS = np.array([0.35, 0.25, 0.25, 0.15])
+
+# Tiers ordered from lowest to highest risk, split at TIER_THRESHOLDS
+RISK_TIERS = ("Very Low", "Low", "Low-Medium", "Medium", "High")
+TIER_THRESHOLDS = np.array([0.2, 0.35, 0.5, 0.65])
+
+
+@dataclass(frozen=True)
+class RiskScores:
+    scores: np.ndarray  # float64, 0 (no risk) to 1 (highest risk)
+    tiers: np.ndarray  # int8 indices into RISK_TIERS
+
+    def tier_names(self) -> np.ndarray:
+        return np.asarray(RISK_TIERS, dtype=object)[self.tiers]
+
+
+def score_indicators(matrix: np.ndarray) -> np.ndarray:
+    """Score an (n, len(INDICATORS)) indicator matrix, returning n scores in [0, 1]"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(INDICATORS):
+        raise ValueError(f"Expected an (n, {len(INDICATORS)}) indicator matrix, got shape {matrix.shape}")
+    low, high = REFERENCE_RANGES[:, 0], REFERENCE_RANGES[:, 1]
+    scaled = np.clip((matrix - low) / (high - low), 0.0, 1.0)
+    # Missing indicators contribute nothing rather than poisoning the score
+    np.nan_to_num(scaled, copy=False, nan=0.0)
+    return scaled @ WEIGHTS
+
+
+def assign_tiers(scores: np.ndarray) -> np.ndarray:
+    """Map scores to tier indices into RISK_TIERS"""
+    return np.digitize(scores, TIER_THRESHOLDS).astype(np.int8)
+
+
+def indicator_matrix(records: Sequence[Dict[str, float]]) -> np.ndarray:
+    """Stack per-location indicator dicts into a matrix, with NaN for missing values"""
+    return np.array(
+        [[record.get(name, np.nan) for name in INDICATORS] for record in records],
+        dtype=np.float64,
+    ).reshape(len(records), len(INDICATORS))
+
+
+def score_dataset(matrix: np.ndarray) -> RiskScores:
+    """Score a whole dataset"""
+    scores = score_indicators(matrix)
+    return RiskScores(scores=scores, tiers=assign_tiers(scores))
@@ -0,0 +1,163 @@
+"""Precomputed, memory-mapped risk table.
+
+The table is a fixed-layout little-endian binary file: a 64-byte header
+followed by one fixed-size record per location, sorted by name. The name and
+ward fields are sized from the data when the table is written, so no value is
+ever truncated, and the header records their sizes. Each Streamlit
+process maps the file read-only, so all workers on a host share the same page
+cache pages instead of holding private copies, and opening the table parses
+nothing beyond the header.
+
+Usage:
+    python risk_table.py    # rebuild data/risk_table.bin from the location store
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from risk_scoring import INDICATORS, RISK_TIERS
+
+logger = logging.getLogger(__name__)
+
+RISK_TABLE_PATH = Path(__file__).parent / "data" / "risk_table.bin"
+
+MAGIC = b"GENTRISK"
+FORMAT_VERSION = 2
+# magic, format version, record size, record count, dataset version, name field size, ward field size
+HEADER = struct.Struct("<8sHHI16sHH")
+HEADER_SIZE = 64
+# Smallest name and ward field sizes in bytes; larger ones are rounded up to a multiple of 8
+MIN_NAME_SIZE = 48
+MIN_WARD_SIZE = 32
+
+
+def record_dtype(name_size: int = MIN_NAME_SIZE, ward_size: int = MIN_WARD_SIZE) -> np.dtype:
+    """Record layout for the given name and ward field sizes in bytes"""
+    return np.dtype([
+        ("name", f"S{name_size}"),
+        ("ward", f"S{ward_size}"),
+        ("tier", "u1"),
+        ("_pad", "V3"),
+        ("score", "<f4"),
+        ("lon", "<f8"),
+        ("lat", "<f8"),
+        ("indicators", "<f4", (len(INDICATORS),)),
+    ])
+
+
+def _field_size(values: Iterable[bytes], minimum: int) -> int:
+    # Multiples of 8 keep the numeric fields after the strings aligned
+    longest = max((len(value) for value in values), default=0)
+    return max(minimum, -(-longest // 8) * 8)
+
+
+class RiskTable:
+    """Read-only view over a memory-mapped risk table file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, format_version, record_size, count, version, name_size, ward_size = \
+                HEADER.unpack_from(self._mmap, 0)
+        except struct.error:
+            magic = None
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compatible risk table")
+        self.dtype = record_dtype(name_size, ward_size)
+        if record_size != self.dtype.itemsize:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compatible risk table")
+        self.version = version.rstrip(b"\0").decode("ascii")
+        # Zero-copy structured view straight onto the mapped pages
+        self.records = np.frombuffer(self._mmap, dtype=self.dtype, count=count, offset=HEADER_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _index(self, name: str) -> Optional[int]:
+        key = name.upper().encode("utf-8")
+        if len(key) > self.dtype["name"].itemsize:
+            # Longer than every stored name, so not in the table
+            return None
+        i = int(np.searchsorted(self.records["name"], key))
+        if i < len(self.records) and self.records["name"][i] == key:
+            return i
+        return None
+
+    def lookup(self, name: str) -> Optional[Tuple[str, float]]:
+        """Return (risk tier, score) for a location name, or None if unknown"""
+        i = self._index(name)
+        if i is None:
+            return None
+        record = self.records[i]
+        return RISK_TIERS[record["tier"]], float(record["score"])
+
+    def ward(self, name: str) -> Optional[str]:
+        i = self._index(name)
+        return None if i is None else self.records["ward"][i].decode("utf-8")
+
+
+def write_risk_table(rows: Iterable[tuple], dataset_version: str, path: Path = RISK_TABLE_PATH) -> int:
+    """Write (name, ward, risk, risk_score, lon, lat, *indicators) rows as a risk table"""
+    rows = sorted(rows, key=lambda row: row[0].upper())
+    names = [row[0].upper().encode("utf-8") for row in rows]
+    wards = [row[1].encode("utf-8") for row in rows]
+    name_size = _field_size(names, MIN_NAME_SIZE)
+    ward_size = _field_size(wards, MIN_WARD_SIZE)
+    records = np.zeros(len(rows), dtype=record_dtype(name_size, ward_size))
+    for i, (_, _, risk, score, lon, lat, *indicators) in enumerate(rows):
+        records[i]["name"] = names[i]
+        records[i]["ward"] = wards[i]
+        records[i]["tier"] = RISK_TIERS.index(risk)
+        records[i]["score"] = score
+        records[i]["lon"] = lon
+        records[i]["lat"] = lat
+        records[i]["indicators"] = [np.nan if v is None else v for v in indicators]
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, records.dtype.itemsize, len(records),
+                         dataset_version.encode("ascii"), name_size, ward_size)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(records.tobytes())
+    # Replacing rather than rewriting keeps existing mappings valid in other processes
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+def open_risk_table(store, path: Path = RISK_TABLE_PATH) -> RiskTable:
+    """Open the risk table for ``store``, rebuilding it if it is missing or stale"""
+    try:
+        table = RiskTable(path)
+        if table.version == store.version:
+            return table
+    except (OSError, ValueError):
+        pass
+
+    count = write_risk_table(store.risk_rows(), store.version, path)
+    logger.info(f"Built risk table {path} ({count} locations, version {store.version})")
+    return RiskTable(path)
+
+
+def main() -> int:
+    from location_store import LocationStore
+
+    logging.basicConfig(level=logging.INFO)
+    store = LocationStore.open()
+    count = write_risk_table(store.risk_rows(), store.version)
+    logger.info(f"Wrote {count} locations to {RISK_TABLE_PATH} (version {store.version})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Compiled keyword rubrics for grading free-text answers in the Learn modules.
+
+Each rubric is a list of concepts; a concept is one or more keywords that
+count as the same idea. Keywords are reduced to a light stem and the whole
+rubric is compiled into a single regular expression with one named group per
+concept, so grading is one word-bounded pass over the answer. Inflected forms
+("displaced", "displacement", "displacing") all match their concept, and each
+concept is counted at most once.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Sequence, Tuple
+
+# Checked longest first; a stem must keep at least MIN_STEM_LENGTH letters
+SUFFIXES = (
+    "ements", "ement", "ments", "ment", "iest", "ings", "ing", "ier", "ies",
+    "ers", "est", "ed", "er", "es", "ly", "s", "y", "e",
+)
+MIN_STEM_LENGTH = 3
+
+_SUFFIX_PATTERN = "(?:" + "|".join(SUFFIXES) + ")?"
+
+
+def stem(word: str) -> str:
+    """Strip one common English suffix, e.g. "displacement" -> "displac" """
+    word = word.lower()
+    for suffix in SUFFIXES:
+        if not word.endswith(suffix) or len(word) - len(suffix) < MIN_STEM_LENGTH:
+            continue
+        # Keep "less", "loss", "process" intact
+        if suffix in ("s", "es") and word.endswith("ss"):
+            continue
+        return word[:-len(suffix)]
+    return word
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """Word-bounded pattern matching any inflection of each word in a keyword or phrase"""
+    words = [re.escape(stem(word)) + _SUFFIX_PATTERN for word in keyword.split()]
+    return r"\b" + r"\s+".join(words) + r"\b"
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    score: int
+    concepts: Tuple[str, ...]
+
+
+@dataclass
+class Rubric:
+    """A set of concepts compiled into a single matcher"""
+    concepts: Sequence[Sequence[str]]
+    _pattern: "re.Pattern[str]" = field(init=False, repr=False)
+
+    def __post_init__(self):
+        groups = []
+        for i, keywords in enumerate(self.concepts):
+            # Dedupe keywords that share a stem, e.g. "bad" and "badly"
+            patterns = dict.fromkeys(_keyword_pattern(keyword) for keyword in keywords)
+            groups.append(f"(?P<c{i}>{'|'.join(patterns)})")
+        self._pattern = re.compile("|".join(groups), re.IGNORECASE)
+
+    def match(self, text: str) -> MatchResult:
+        found = set()
+        for m in self._pattern.finditer(text):
+            found.add(int(m.lastgroup[1:]))
+        concepts = tuple(self.concepts[i][0] for i in sorted(found))
+        return MatchResult(score=len(concepts), concepts=concepts)
+
+    def score(self, text: str) -> int:
+        return self.match(text).score
+
+
+# Rubrics keyed by Learn module number; compiled once at import and shared by all sessions
+RUBRICS: Dict[int, Rubric] = {
+    1: Rubric([
+        ["process"],
+        ["wealthy"],
+        ["displacement", "displaced", "displace"],
+        ["move out"],
+    ]),
+    2: Rubric([
+        ["rent"],
+        ["higher"],
+        ["loss"],
+        ["customers"],
+        ["less"],
+        ["badly", "bad"],
+    ]),
+}
+
+# Model explanations shown after each free-text question, also used by similarity grading
+REFERENCE_ANSWERS: Dict[int, str] = {
+    1: (
+        "**Gentrification** is the displacement of existing low income communities by wealthiest families \n"
+        "or newcomers to the re-developeded area."
+    ),
+    2: (
+        "Small businesses in gentrifying areas often face rising rents and changing customer demographics \n"
+        "(from low income to high income customers. The shop will not be able to cater to the new customer base), \n"
+        "which can lead to displacement or forced closures, even if they have strong local ties in the community."
+    ),
+}
+
+
+def grade(module: int, text: str) -> MatchResult:
+    """Grade a free-text answer against the rubric for a Learn module"""
+    try:
+        rubric = RUBRICS[module]
+    except KeyError:
+        raise ValueError(f"No rubric for module {module}")
+    return rubric.match(text)
@@ -0,0 +1,78 @@
+"""Scenario bank for the Play page.
+
+Scenarios, their answer options and correct answers live together in
+``data/scenarios.json``. The bank is loaded once per process and indexed by
+id and by pool, so checking an answer is a dict lookup and drawing a session's
+scenarios samples ids without touching the scenario bodies.
+"""
+import json
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SCENARIOS_PATH = Path(__file__).parent / "data" / "scenarios.json"
+DEFAULT_POOL = "core"
+
+
+@dataclass(frozen=True)
+class Scenario:
+    id: str
+    pool: str
+    title: str
+    text: str
+    options: Tuple[str, ...]
+    answer: str
+
+
+class ScenarioBank:
+    """Immutable scenario collection indexed by id and pool"""
+
+    def __init__(self, scenarios: List[Scenario]):
+        self._by_id: Dict[str, Scenario] = {}
+        pools: Dict[str, List[str]] = {}
+        for scenario in scenarios:
+            if scenario.id in self._by_id:
+                raise ValueError(f"Duplicate scenario id: {scenario.id}")
+            if scenario.answer not in scenario.options:
+                raise ValueError(f"Scenario {scenario.id}: answer {scenario.answer!r} is not one of its options")
+            self._by_id[scenario.id] = scenario
+            pools.setdefault(scenario.pool, []).append(scenario.id)
+        self._pools: Dict[str, Tuple[str, ...]] = {pool: tuple(ids) for pool, ids in pools.items()}
+
+    @classmethod
+    def load(cls, path: Path = SCENARIOS_PATH) -> "ScenarioBank":
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)["scenarios"]
+        return cls([
+            Scenario(
+                id=str(r["id"]),
+                pool=r.get("pool", DEFAULT_POOL),
+                title=r.get("title", f"Scenario {r['id']}"),
+                text=r["text"],
+                options=tuple(r["options"]),
+                answer=r["answer"],
+            )
+            for r in records
+        ])
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, scenario_id: str) -> Optional[Scenario]:
+        return self._by_id.get(scenario_id)
+
+    def pool(self, name: str = DEFAULT_POOL) -> Tuple[str, ...]:
+        return self._pools.get(name, ())
+
+    def is_correct(self, scenario_id: str, answer: str) -> bool:
+        scenario = self._by_id.get(scenario_id)
+        return scenario is not None and scenario.answer == answer
+
+    def draw(self, count: int, pool: str = DEFAULT_POOL, rng: Optional[random.Random] = None) -> List[str]:
+        """Pick up to ``count`` distinct scenario ids from a pool, in pool order"""
+        ids = self.pool(pool)
+        if count >= len(ids):
+            return list(ids)
+        picked = set((rng or random).sample(range(len(ids)), count))
+        return [ids[i] for i in sorted(picked)]
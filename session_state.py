@@ -0,0 +1,136 @@
+"""Typed, compact per-session state for the app.
+
+All app state for a session lives in one slotted ``AppState`` object stored
+under a single ``st.session_state`` key. Completed modules and scenarios are
+bitsets packed into ints rather than sets and lists, and ``deep_sizeof``
+gives a per-session memory estimate for capacity planning.
+"""
+import sys
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from donation_ledger import MAX_AMOUNT_CENTS
+from theme import DEFAULT_THEME
+
+LEARN_MODULES = 3
+
+
+@dataclass(slots=True)
+class DonationInfo:
+    name: str = ""
+    phone: str = ""
+    email: str = ""
+    bank: str = ""
+    amount: str = ""
+
+    def is_complete(self) -> bool:
+        return all(getattr(self, f.name) for f in fields(self))
+
+    def amount_cents(self) -> Optional[int]:
+        """Amount as cents if it is a whole number of dollars within the donation limit, else None"""
+        # isascii: isdigit() also accepts characters like "²" that int() rejects
+        if not (self.amount.isascii() and self.amount.isdigit()):
+            return None
+        cents = int(self.amount) * 100
+        return cents if 0 < cents <= MAX_AMOUNT_CENTS else None
+
+
+@dataclass(slots=True)
+class AppState:
+    page: str = "HOME"
+    # Anonymous id tying a session's events together
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    theme: str = DEFAULT_THEME
+
+    # Learn
+    current_module: int = 1
+    learn_progress: float = 0.0
+    completed_modules: int = 0  # bit n - 1 set when module n is completed
+
+    # Play
+    scenario_ids: Tuple[str, ...] = ()
+    completed_scenarios: int = 0  # bit i set when scenario_ids[i] is completed
+    current_scenario: Optional[str] = None
+    scenario_result: Optional[str] = None
+
+    # Donate
+    donation: DonationInfo = field(default_factory=DonationInfo)
+    confirm_donation: bool = False
+    donation_successful: bool = False
+    # Idempotency key of the reviewed donation, so a repeated confirm is recorded once
+    donation_key: str = ""
+    donation_failed: bool = False
+    payment_pending: bool = False
+
+    # Hidden ADMIN page
+    admin_unlocked: bool = False
+
+    # Script executions, for checking reruns per interaction
+    script_runs: int = 0
+    interactions: int = 0
+    runs_since_interaction: int = 0
+    fragment_runs: int = 0
+    deltas_this_run: int = 0
+    deltas_last_run: int = 0
+    # Sent by fragments rerunning on their own, kept out of the full-run counts
+    fragment_deltas: int = 0
+
+    def module_completed(self, module: int) -> bool:
+        return bool(self.completed_modules >> (module - 1) & 1)
+
+    def complete_module(self, module: int) -> None:
+        self.completed_modules |= 1 << (module - 1)
+
+    def completed_module_count(self) -> int:
+        return bin(self.completed_modules).count("1")
+
+    def start_scenario_round(self, scenario_ids: Iterable[str]) -> None:
+        self.scenario_ids = tuple(scenario_ids)
+        self.completed_scenarios = 0
+        self.current_scenario = None
+        self.scenario_result = None
+
+    def complete_scenario(self, scenario_id: str) -> None:
+        if scenario_id in self.scenario_ids:
+            self.completed_scenarios |= 1 << self.scenario_ids.index(scenario_id)
+
+    def remaining_scenarios(self) -> List[str]:
+        return [
+            scenario_id for i, scenario_id in enumerate(self.scenario_ids)
+            if not self.completed_scenarios >> i & 1
+        ]
+
+    def reset_learning(self) -> None:
+        self.learn_progress = 0.0
+        self.current_module = 1
+
+    def reset_donation(self) -> None:
+        self.donation = DonationInfo()
+        self.confirm_donation = False
+        self.donation_successful = False
+        self.donation_key = ""
+        self.donation_failed = False
+        self.payment_pending = False
+
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Approximate retained size of an object graph in bytes, counting shared objects once"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    else:
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+        if hasattr(obj, "__dict__"):
+            size += deep_sizeof(vars(obj), seen)
+    return size
@@ -0,0 +1,81 @@
+"""Hashed TF-IDF similarity grading for Learn free-text answers.
+
+Reference answers are tokenised, stemmed with the rubric stemmer and hashed
+into a fixed-size sparse feature space, weighted by inverse document frequency
+over the reference sentences and L2-normalised once. A submission is scored by
+vectorising it the same way and taking a single sparse dot product with its
+module's reference vector, giving a cosine similarity between 0 and 1.
+"""
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Dict
+
+from rubrics import REFERENCE_ANSWERS, stem
+
+N_FEATURES = 1 << 18
+# Minimum cosine similarity for an answer to count as on track
+SIMILARITY_PASS_THRESHOLD = 0.2
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+SENTENCE_PATTERN = re.compile(r"[.!?;()]+")
+STOPWORDS = frozenset("""
+    a an and are as at be been but by can do does for from has have if in into is it its
+    of on or so such than that the their them then there these they this to was were
+    which while who will with would you your i my me we our not no even
+""".split())
+
+SparseVector = Dict[int, float]
+
+
+def _hashed_counts(text: str) -> Counter:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return Counter(
+        zlib.crc32(stem(token).encode()) % N_FEATURES
+        for token in tokens
+        if token not in STOPWORDS
+    )
+
+
+def _normalise(vector: SparseVector) -> SparseVector:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {feature: weight / norm for feature, weight in vector.items()} if norm else {}
+
+
+class SimilarityGrader:
+    """Cosine similarity of answers against precomputed reference vectors"""
+
+    def __init__(self, references: Dict[int, str] = REFERENCE_ANSWERS):
+        # Each reference sentence is one document for document frequencies
+        documents = [
+            sentence
+            for text in references.values()
+            for sentence in SENTENCE_PATTERN.split(text)
+            if sentence.strip()
+        ]
+        document_frequency: Counter = Counter()
+        for document in documents:
+            document_frequency.update(set(_hashed_counts(document)))
+
+        n = len(documents)
+        self._idf = {feature: math.log((1 + n) / (1 + df)) + 1 for feature, df in document_frequency.items()}
+        # Words never seen in a reference are as rare as possible
+        self._default_idf = math.log(1 + n) + 1
+        self._references = {module: self.vectorize(text) for module, text in references.items()}
+
+    def vectorize(self, text: str) -> SparseVector:
+        return _normalise({
+            feature: (1 + math.log(count)) * self._idf.get(feature, self._default_idf)
+            for feature, count in _hashed_counts(text).items()
+        })
+
+    def similarity(self, module: int, text: str) -> float:
+        try:
+            reference = self._references[module]
+        except KeyError:
+            raise ValueError(f"No reference answer for module {module}")
+        submission = self.vectorize(text)
+        if len(submission) > len(reference):
+            submission, reference = reference, submission
+        return sum(weight * reference.get(feature, 0.0) for feature, weight in submission.items())
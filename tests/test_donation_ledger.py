@@ -0,0 +1,125 @@
+import sqlite3
+
+import pytest
+
+from donation_ledger import MAX_AMOUNT_CENTS, DonationLedger, DonationRecord, iter_csv, totals
+from session_state import DonationInfo
+
+TIMEOUT = 10
+
+
+def donation(key, amount_cents=2500, bank="RBC", **overrides):
+    fields = dict(idempotency_key=key, amount_cents=amount_cents, name="Ana",
+                  email="ana@example.com", phone="6135550100", bank=bank)
+    fields.update(overrides)
+    return DonationRecord(**fields)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DonationLedger(tmp_path / "donations.db")
+    yield ledger
+    ledger.close()
+
+
+def rows(ledger):
+    conn = sqlite3.connect(ledger.path)
+    try:
+        return conn.execute("SELECT idempotency_key, amount_cents FROM donations ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_duplicate_key_is_recorded_once(ledger):
+    assert ledger.record(donation("k1")).result(TIMEOUT) is True
+    assert ledger.record(donation("k1", amount_cents=9900)).result(TIMEOUT) is False
+    assert rows(ledger) == [("k1", 2500)]
+    assert totals(ledger.path)["count"] == 1
+
+
+@pytest.mark.parametrize("amount_cents", [0, -100, MAX_AMOUNT_CENTS + 1, 10 ** 22, "2500"])
+def test_out_of_range_amount_is_rejected(ledger, amount_cents):
+    with pytest.raises(ValueError):
+        ledger.record(donation("bad", amount_cents=amount_cents)).result(TIMEOUT)
+    assert rows(ledger) == []
+    # The writer is still running
+    assert ledger.record(donation("good")).result(TIMEOUT) is True
+
+
+@pytest.mark.parametrize("amount", ["0", "²", "99999999999999999999", "12.50", "-5", ""])
+def test_form_amount_validation(amount):
+    assert DonationInfo(amount=amount).amount_cents() is None
+
+
+def test_form_amount_in_cents():
+    assert DonationInfo(amount="25").amount_cents() == 2500
+
+
+def test_failed_donation_does_not_fail_its_batch_or_the_writer(ledger):
+    futures = [
+        ledger.record(donation("before")),
+        # NOT NULL constraint failure inside the transaction
+        ledger.record(donation("null-bank", bank=None)),
+        # Non-sqlite error while building the row
+        ledger.record(donation("bad-date", created_at=12345)),
+        ledger.record(donation("after")),
+    ]
+    assert futures[0].result(TIMEOUT) is True
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result(TIMEOUT)
+    with pytest.raises(TypeError):
+        futures[2].result(TIMEOUT)
+    assert futures[3].result(TIMEOUT) is True
+    assert ledger.record(donation("later")).result(TIMEOUT) is True
+    assert [key for key, _ in rows(ledger)] == ["before", "after", "later"]
+
+
+def test_totals_match_the_donations(ledger):
+    futures = [
+        ledger.record(donation(f"k{i}", amount_cents=100 * (i % 7 + 1), bank=("rbc", "RBC", "TD")[i % 3],
+                               created_at=f"2026-10-{i % 3 + 1:02d}T12:00:00+00:00"))
+        for i in range(300)
+    ]
+    futures.append(ledger.record(donation("k0")))  # duplicate, must not count
+    for future in futures:
+        future.result(TIMEOUT)
+
+    campaign = totals(ledger.path)
+    conn = sqlite3.connect(ledger.path)
+    try:
+        count, total = conn.execute("SELECT COUNT(*), SUM(amount_cents) FROM donations").fetchone()
+        by_day = dict(conn.execute(
+            "SELECT substr(created_at, 1, 10), SUM(amount_cents) FROM donations GROUP BY 1").fetchall())
+        by_bank = dict(conn.execute(
+            "SELECT upper(bank), SUM(amount_cents) FROM donations GROUP BY 1").fetchall())
+    finally:
+        conn.close()
+    assert (campaign["count"], campaign["total_cents"]) == (count, total) == (300, total)
+    assert {row["day"]: row["total_cents"] for row in campaign["by_day"]} == by_day
+    assert {row["bank"]: row["total_cents"] for row in campaign["by_bank"]} == by_bank
+    assert set(by_bank) == {"RBC", "TD"}
+
+
+def test_csv_export_streams_every_row(ledger):
+    for i in range(25):
+        ledger.record(donation(f"k{i}")).result(TIMEOUT)
+    chunks = list(iter_csv(ledger.path, chunk_rows=10))
+    assert len(chunks) == 1 + 3
+    assert "".join(chunks).count("\n") == 1 + 25
+
+
+def test_totals_backfill_a_ledger_from_before_the_summary_tables(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE donations (id INTEGER PRIMARY KEY, idempotency_key TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL, amount_cents INTEGER NOT NULL, name TEXT NOT NULL,
+            email TEXT NOT NULL, phone TEXT NOT NULL, bank TEXT NOT NULL);
+        INSERT INTO donations VALUES (1, 'k1', '2026-10-01T12:00:00+00:00', 2500, 'Ana', 'a@b', '1', 'rbc');
+        INSERT INTO donations VALUES (2, 'k2', '2026-10-02T12:00:00+00:00', 1000, 'Bo', 'b@c', '2', 'RBC');
+    """)
+    conn.close()
+    # No DonationLedger has opened this file
+    campaign = totals(path)
+    assert (campaign["count"], campaign["total_cents"]) == (2, 3500)
+    assert campaign["by_bank"] == [{"bank": "RBC", "count": 2, "total_cents": 3500}]
@@ -0,0 +1,25 @@
+from streamlit.testing.v1 import AppTest
+
+
+def counting_app():
+    import streamlit as st
+
+    from instrumentation import count_deltas
+
+    deltas = st.session_state.setdefault("deltas", [])
+    st.session_state.hooked = count_deltas(deltas.append)
+    st.write("one")
+    st.write("two")
+
+
+def test_count_deltas_hooks_streamlit():
+    # Relies on Streamlit's private ScriptRunContext._enqueue; if this fails after a
+    # Streamlit upgrade, the debug sidebar's delta counts have stopped working
+    at = AppTest.from_function(counting_app).run()
+    assert not at.exception
+    assert at.session_state.hooked is True
+    at.run()
+    # Wrapped once per session: the second run adds its own deltas, not doubled ones
+    deltas = at.session_state.deltas
+    assert len(deltas) >= 4 and len(deltas) % 2 == 0
+    assert not any(deltas)
@@ -0,0 +1,202 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import payments
+from mock_processor import MockProcessor
+from payments import CHARGED, FAILED, PENDING, SETTLED, PaymentClient, PaymentService
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def processor():
+    """A mock processor on its own event loop thread; yields (processor, base_url)"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    mock = MockProcessor(settle_seconds=0.05, seed=1)
+    server = asyncio.run_coroutine_threadsafe(mock.serve("127.0.0.1", 0), loop).result(TIMEOUT)
+    port = server.sockets[0].getsockname()[1]
+    yield mock, f"http://127.0.0.1:{port}"
+
+    async def shutdown():
+        server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(TIMEOUT)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(TIMEOUT)
+    loop.close()
+
+
+@pytest.fixture
+def service(processor, monkeypatch):
+    monkeypatch.setattr(payments, "SETTLE_POLL_INTERVAL", 0.02)
+    service = PaymentService(processor[1])
+    yield service
+    service.close()
+
+
+def wait_for_state(service, key, states):
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        status = service.status(key)
+        if status is not None and status.state in states:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"{key} never reached {states}: {service.status(key)}")
+
+
+def done(value=True):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_settled_charge_is_recorded_once(processor, service):
+    recorded = []
+    assert service.start_charge("k1", 2500, lambda: recorded.append(1) or done()).state == PENDING
+    assert wait_for_state(service, "k1", (SETTLED, FAILED)).state == SETTLED
+    # A repeated confirm neither charges nor records again
+    assert service.start_charge("k1", 2500, lambda: recorded.append(1) or done()).state == SETTLED
+    assert recorded == [1]
+    assert len(processor[0].charges) == 1
+
+
+def test_declined_charge_fails(processor, service):
+    processor[0].decline_rate = 1.0
+    service.start_charge("k1", 2500)
+    assert "declined" in wait_for_state(service, "k1", (FAILED,)).detail
+
+
+def test_recording_failure_is_charged_not_failed_and_retried(service, monkeypatch):
+    monkeypatch.setattr(payments, "RECORD_TIMEOUT", 0.05)
+    monkeypatch.setattr(payments, "BACKOFF_BASE", 0.01)
+    calls = []
+
+    def on_settled():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("ledger unavailable")
+        if len(calls) == 2:
+            return Future()  # never completes, like a dead writer thread
+        return done()
+
+    service.start_charge("k1", 2500, on_settled)
+    status = wait_for_state(service, "k1", (CHARGED, FAILED))
+    assert status.state == CHARGED
+    assert wait_for_state(service, "k1", (SETTLED, FAILED)).state == SETTLED
+    assert len(calls) == 3
+
+
+def test_recording_gives_up_but_stays_charged(service, monkeypatch):
+    monkeypatch.setattr(payments, "RECORD_TIMEOUT", 0.01)
+    monkeypatch.setattr(payments, "RECORD_ATTEMPTS", 2)
+    monkeypatch.setattr(payments, "BACKOFF_BASE", 0.001)
+    service.start_charge("k1", 2500, Future)
+    wait_for_state(service, "k1", (CHARGED,))
+    time.sleep(0.2)
+    assert service.status("k1").state == CHARGED
+
+
+def test_finished_charges_are_pruned(service, monkeypatch):
+    monkeypatch.setattr(payments, "STATUS_TTL", 0.05)
+    service._next_prune = 0
+    service.start_charge("old", 2500)
+    wait_for_state(service, "old", (SETTLED,))
+    time.sleep(0.1)
+    service._next_prune = 0
+    service.start_charge("new", 2500)
+    assert service.status("old") is None
+    assert service.status("new") is not None
+
+
+async def serve_responses(responses, ssl_context=None):
+    """A server answering each request, in turn, with the next raw response"""
+    replies = iter(responses)
+
+    async def handle(reader, writer):
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(next((line.split(b":")[1] for line in head.split(b"\r\n")
+                               if line.lower().startswith(b"content-length")), 0))
+            await reader.readexactly(length)
+            writer.write(next(replies))
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl_context)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def run_requests(responses, paths, scheme="http", server_ssl=None, client_ssl=None):
+    """Send GETs for ``paths`` through one client; returns the payloads and connections opened"""
+    async def main():
+        server, port = await serve_responses(responses, server_ssl)
+        client = PaymentClient(f"{scheme}://127.0.0.1:{port}", max_attempts=2, ssl_context=client_ssl)
+        try:
+            return [await client.request("GET", path) for path in paths], client.pool.opened
+        finally:
+            client.close()
+            server.close()
+
+    return asyncio.run(main())
+
+
+def chunked(*parts):
+    body = b"".join(b"%x;ext=1\r\n%s\r\n" % (len(part), part) for part in parts)
+    return (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+            + body + b"0\r\nX-Trailer: 1\r\n\r\n")
+
+
+CHUNKED = chunked(b'{"id": "ch_1", ', b'"status": "pending"}')
+
+
+def test_chunked_response_is_decoded_and_connection_reused():
+    payloads, opened = run_requests([CHUNKED, CHUNKED], ["/v1/charges/ch_1"] * 2)
+    assert payloads == [{"id": "ch_1", "status": "pending"}] * 2
+    assert opened == 1
+
+
+def test_partly_read_response_is_not_pooled(monkeypatch):
+    monkeypatch.setattr(payments, "REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(payments, "BACKOFF_BASE", 0.001)
+    truncated = b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n{\"id\":"
+    ok = b'HTTP/1.1 200 OK\r\nContent-Length: 12\r\n\r\n{"id": "ch"}'
+    payloads, opened = run_requests([truncated, ok], ["/v1/charges/ch"])
+    # The timed-out connection still held unread bytes, so the retry used a new one
+    assert payloads == [{"id": "ch"}]
+    assert opened == 2
+
+
+def test_https_uses_default_certificate_checks():
+    client = PaymentClient("https://pay.example.com/api")
+    assert client.port == 443
+    assert client.pool.ssl_context.verify_mode == ssl.CERT_REQUIRED
+    assert client.pool.ssl_context.check_hostname
+    assert PaymentClient("http://pay.example.com").pool.ssl_context is None
+    with pytest.raises(ValueError):
+        PaymentClient("ftp://pay.example.com")
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl to make a test certificate")
+def test_https_request(tmp_path):
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", str(key), "-out", str(cert)], check=True, capture_output=True)
+    server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_ssl.load_cert_chain(cert, key)
+    payloads, _ = run_requests([CHUNKED], ["/v1/charges/ch_1"], "https", server_ssl,
+                               ssl.create_default_context(cafile=str(cert)))
+    assert payloads == [{"id": "ch_1", "status": "pending"}]
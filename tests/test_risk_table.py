@@ -0,0 +1,38 @@
+import pytest
+
+from risk_scoring import INDICATORS
+from risk_table import MIN_NAME_SIZE, RiskTable, write_risk_table
+
+
+def row(name, ward, risk="Low"):
+    return (name, ward, risk, 0.5, -75.7, 45.4, *[0.1] * len(INDICATORS))
+
+
+@pytest.fixture
+def write_table(tmp_path):
+    def write(rows):
+        path = tmp_path / "risk_table.bin"
+        write_risk_table(rows, "v1", path)
+        return RiskTable(path)
+    return write
+
+
+def test_long_names_do_not_collide(write_table):
+    table = write_table([row("A" * 60, "Capital", "Low"), row("A" * 48 + "ZZ", "Capital", "High")])
+    assert table.lookup("a" * 60)[0] == "Low"
+    assert table.lookup("A" * 48 + "ZZ")[0] == "High"
+    assert table.lookup("A" * 48) is None
+    assert table.lookup("A" * 200) is None
+
+
+def test_long_multibyte_ward_round_trips(write_table):
+    ward = "Côte-des-Neiges–Notre-Dame-de-Grâce" * 2
+    table = write_table([row("Elgin Street", ward)])
+    assert table.ward("Elgin Street") == ward
+
+
+def test_short_fields_keep_the_minimum_size(write_table):
+    table = write_table([row("Elgin Street", "Somerset")])
+    assert table.dtype["name"].itemsize == MIN_NAME_SIZE
+    assert table.lookup("elgin street") == ("Low", 0.5)
+    assert table.ward("Elgin Street") == "Somerset"
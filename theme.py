@@ -0,0 +1,272 @@
+"""Theme stylesheets for the app.
+
+Colours are defined once in ``THEME`` and emitted as CSS custom properties
+ahead of a shared rule set. Each theme's stylesheet is built once, named by a
+hash of its content and written under ``static/``, so browsers can cache it
+indefinitely and a rerun only has to reference it by URL.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict
+
+STATIC_DIR = Path(__file__).parent / "static"
+# Where Streamlit serves STATIC_DIR when server.enableStaticServing is on
+STATIC_URL = "app/static"
+
+THEME: Dict[str, Dict[str, str]] = {
+    'light': {
+        'primary': '#1E3A8A',
+        'secondary': '#3B82F6',
+        'background': '#F0F9FF',
+        'text': '#1F2937',
+        'success': '#047857',
+        'error': '#DC2626',
+        'warning': '#F59E0B'
+    },
+    'dark': {
+        'primary': '#60A5FA',
+        'secondary': '#93C5FD',
+        'background': '#1F2937',
+        'text': '#F9FAFB',
+        'success': '#34D399',
+        'error': '#EF4444',
+        'warning': '#FBBF24'
+    }
+}
+# "auto" uses light colours unless the browser prefers a dark colour scheme
+THEME_CHOICES = ("auto", "light", "dark")
+DEFAULT_THEME = "auto"
+
+# Rules shared by every theme; colours come from the --<name>-color variables.
+# Card rules also match keyed containers (st-key-<class>-<name>), see components.py
+RULES = """
+/* Typography and base styles */
+* {
+    font-family: system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+    line-height: 1.5;
+}
+
+/* Headers */
+.main-header {
+    font-size: clamp(2rem, 5vw, 2.625rem);
+    font-weight: 800;
+    color: var(--primary-color);
+    text-align: center;
+    margin-bottom: 1.5rem;
+    padding: 1.5rem;
+    background-color: var(--background-color);
+    border-radius: 1rem;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+}
+
+.module-header {
+    font-size: 1.75rem;
+    font-weight: 700;
+    color: var(--primary-color);
+    margin: 1.25rem 0 1rem;
+    padding: 0.75rem;
+    background-color: var(--background-color);
+    border-radius: 0.5rem;
+}
+
+.sub-header {
+    font-size: 1.5rem;
+    font-weight: 600;
+    color: var(--primary-color);
+    margin: 1rem 0 0.75rem;
+}
+
+/* Cards */
+.card,
+[class*="st-key-card-"] {
+    padding: 1.5rem;
+    border-radius: 1rem;
+    background-color: var(--background-color);
+    margin-bottom: 1.5rem;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    transition: transform 0.3s ease, box-shadow 0.3s ease;
+}
+
+.card:hover,
+[class*="st-key-card-"]:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 6px 12px rgba(0, 0, 0, 0.15);
+}
+
+.scenario-card,
+[class*="st-key-scenario-card-"] {
+    padding: 1.5rem;
+    border-radius: 1rem;
+    background-color: var(--background-color);
+    margin-bottom: 1.5rem;
+    border-left: 0.5rem solid var(--secondary-color);
+}
+
+.donate-card,
+[class*="st-key-donate-card-"] {
+    padding: 1.5rem;
+    border-radius: 1rem;
+    background-color: var(--background-color);
+    margin-bottom: 1.5rem;
+    border-left: 0.5rem solid var(--success-color);
+}
+
+.location-card,
+[class*="st-key-location-card-"] {
+    padding: 1.25rem;
+    border-radius: 0.75rem;
+    background-color: var(--background-color);
+    margin-bottom: 1.25rem;
+    border-left: 0.5rem solid var(--secondary-color);
+}
+
+/* Interactive elements */
+.button-primary {
+    background-color: var(--primary-color);
+    color: white;
+    border-radius: 0.5rem;
+    padding: 0.75rem 1rem;
+    font-weight: 600;
+    border: none;
+    cursor: pointer;
+    transition: all 0.3s ease;
+}
+
+.button-primary:hover {
+    background-color: var(--secondary-color);
+    transform: translateY(-1px);
+}
+
+.button-success {
+    background-color: var(--success-color);
+    color: white;
+    border-radius: 0.5rem;
+    padding: 0.75rem 1rem;
+    font-weight: 600;
+    border: none;
+    cursor: pointer;
+    transition: all 0.3s ease;
+}
+
+.button-warning {
+    background-color: var(--warning-color);
+    color: white;
+    border-radius: 0.5rem;
+    padding: 0.75rem 1rem;
+    font-weight: 600;
+    border: none;
+    cursor: pointer;
+    transition: all 0.3s ease;
+}
+
+/* Progress and status indicators */
+.progress-container {
+    width: 100%;
+    background-color: var(--background-color);
+    border-radius: 1rem;
+    margin: 1.5rem 0;
+    overflow: hidden;
+    box-shadow: inset 0 2px 4px rgba(0, 0, 0, 0.1);
+}
+
+.progress-bar {
+    height: 0.75rem;
+    border-radius: 1rem;
+    background: linear-gradient(90deg, var(--primary-color), var(--secondary-color));
+    transition: width 0.5s ease-in-out;
+}
+
+/* Status messages */
+.correct-answer {
+    color: var(--success-color);
+    font-weight: 600;
+}
+
+.wrong-answer {
+    color: var(--error-color);
+    font-weight: 600;
+}
+
+.highlight-text {
+    background-color: var(--warning-color);
+    padding: 0.25rem 0.5rem;
+    border-radius: 0.25rem;
+    color: var(--text-color);
+}
+
+/* Form elements */
+.stTextInput > div > div > input,
+.stTextArea > div > div > textarea {
+    border-radius: 0.5rem;
+    border: 2px solid var(--background-color);
+    padding: 0.75rem;
+    transition: border-color 0.3s ease;
+}
+
+.stTextInput > div > div > input:focus,
+.stTextArea > div > div > textarea:focus {
+    border-color: var(--primary-color);
+    outline: none;
+}
+
+/* Mobile responsiveness */
+@media (max-width: 768px) {
+    .main-header {
+        font-size: 1.75rem;
+        padding: 1rem;
+    }
+
+    .module-header {
+        font-size: 1.5rem;
+    }
+
+    .card,
+    [class*="st-key-card-"] {
+        padding: 1rem;
+    }
+
+    .button-primary,
+    .button-success,
+    .button-warning {
+        padding: 0.5rem 0.75rem;
+    }
+}
+"""
+
+
+def _variables(theme: str, indent: str = "    ") -> str:
+    colours = "\n".join(f"{indent}    --{name}-color: {value};" for name, value in THEME[theme].items())
+    return f"{indent}:root {{\n{colours}\n{indent}}}"
+
+
+def build_stylesheet(theme: str) -> str:
+    """Full stylesheet text for a theme"""
+    if theme == "auto":
+        variables = (
+            _variables("light", indent="") + "\n\n"
+            "@media (prefers-color-scheme: dark) {\n" + _variables("dark") + "\n}"
+        )
+    elif theme in THEME:
+        variables = _variables(theme, indent="")
+    else:
+        raise ValueError(f"Unknown theme: {theme}")
+    return variables + "\n" + RULES
+
+
+def stylesheet_name(theme: str, css: str) -> str:
+    digest = hashlib.sha1(css.encode("utf-8")).hexdigest()[:12]
+    return f"theme-{theme}-{digest}.css"
+
+
+def write_stylesheet(theme: str, static_dir: Path = STATIC_DIR) -> str:
+    """Write a theme's stylesheet under its content-hashed name and return that name"""
+    css = build_stylesheet(theme)
+    name = stylesheet_name(theme, css)
+    path = static_dir / name
+    if not path.exists():
+        static_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(css, encoding="utf-8")
+        os.replace(tmp_path, path)
+    return name